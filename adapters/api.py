@@ -1,12 +1,156 @@
-from typing import TypedDict
-
-from httpx import AsyncClient
-
+import asyncio
+import random
+from time import perf_counter
+from typing import Any, TypedDict
+
+from httpx import Response, Timeout, TransportError
+
+from common import fast_json
+from common.cache import TTLCache
+from common.circuit_breaker import CircuitBreaker, CircuitState
+from common.http import get_http_client
+from common.metrics import Gauge, LabeledGauge, LabeledHistogram
+from common.single_flight import single_flight
 from errors import AdapterAPIError, ServerError
 
 BASE_API_URL = "http://localhost:5000/api/v1"
 
-http_client = AsyncClient()
+# per endpoint, the shared client's default covers the rest
+TIMEOUTS = {
+    "login": Timeout(5.0, connect=1.0),
+    "profile": Timeout(3.0, connect=1.0),
+    "rank": Timeout(2.0, connect=1.0),
+    "rank_thresholds": Timeout(15.0, connect=1.0),
+    "logout": Timeout(3.0, connect=1.0),
+}
+
+# total time per call, retries included
+DEADLINES = {
+    "login": 6.0,
+    "profile": 4.0,
+    "rank": 3.0,
+    "rank_thresholds": 30.0,
+    "logout": 4.0,
+}
+
+# extra attempts for GETs, which are safe to repeat
+GET_RETRIES = 2
+
+# seconds, doubled for every retry and fully jittered
+RETRY_BACKOFF = 0.1
+
+backend_breaker = CircuitBreaker(failure_threshold=5, reset_timeout=10.0)
+
+LabeledGauge(
+    "backend_circuit_state",
+    "1 for the current state of the backend circuit breaker",
+    label="state",
+    collect=lambda: {
+        state.value: int(backend_breaker.state is state) for state in CircuitState
+    },
+)
+Gauge(
+    "backend_circuit_failures",
+    "Consecutive failed backend calls",
+    lambda: backend_breaker.failures,
+)
+
+backend_request_seconds = LabeledHistogram(
+    "backend_request_seconds",
+    "Time spent per backend call, retries included",
+    label="endpoint",
+)
+
+
+async def request(
+    endpoint: str, method: str, path: str, **kwargs: Any
+) -> Response | ServerError:
+    started_at = perf_counter()
+
+    response = await send_request(endpoint, method, path, **kwargs)
+
+    backend_request_seconds.observe(endpoint, perf_counter() - started_at)
+
+    return response
+
+
+async def send_request(
+    endpoint: str, method: str, path: str, **kwargs: Any
+) -> Response | ServerError:
+    """Call the backend within the endpoint's deadline, behind the circuit breaker.
+
+    GETs are retried on connection errors, timeouts and 5xx responses.
+    The last 5xx response is returned as is, so callers report it like any other.
+
+    The breaker sees one outcome per call, once the retries are used up. Only a
+    backend that never answered counts as a failure, a 5xx from one endpoint
+    must not lock every other endpoint out.
+    """
+
+    if not backend_breaker.allow_request():
+        return ServerError(
+            error_name=AdapterAPIError.BACKEND_UNAVAILABLE,
+            message=f"{BASE_API_URL} is failing, skipped {method} {path}",
+            file_location=__file__,
+            line=ServerError.get_current_line(),
+            status_code=503,
+            local_variables=locals(),
+            in_scope_variables=dir(),
+        )
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + DEADLINES[endpoint]
+    attempts = 1 + GET_RETRIES if method == "GET" else 1
+
+    response: Response | None = None
+    error: Exception | None = None
+
+    for attempt in range(attempts):
+        if attempt > 0:
+            backoff = random.uniform(0, RETRY_BACKOFF * 2 ** (attempt - 1))
+
+            # no time left for another try, or other calls opened the breaker meanwhile
+            if (
+                loop.time() + backoff >= deadline
+                or backend_breaker.state is CircuitState.OPEN
+            ):
+                break
+
+            await asyncio.sleep(backoff)
+
+        try:
+            response = await asyncio.wait_for(
+                get_http_client().request(
+                    method,
+                    f"{BASE_API_URL}{path}",
+                    timeout=TIMEOUTS[endpoint],
+                    **kwargs,
+                ),
+                timeout=deadline - loop.time(),
+            )
+        except (TransportError, asyncio.TimeoutError) as exc:
+            error = exc
+            continue
+
+        if response.status_code < 500:
+            break
+
+    # the backend answered, even if only with a 5xx
+    if response is not None:
+        backend_breaker.record_success()
+        return response
+
+    backend_breaker.record_failure()
+
+    return ServerError(
+        error_name=AdapterAPIError.BACKEND_UNAVAILABLE,
+        message=f"{method} {path} failed: {error!r}",
+        file_location=__file__,
+        line=ServerError.get_current_line(),
+        status_code=503,
+        local_variables=locals(),
+        in_scope_variables=dir(),
+    )
 
 
 class LoginProfile(TypedDict):
@@ -27,10 +171,13 @@ class LoginResponse(TypedDict):
 
 
 async def login(username: str) -> LoginResponse | ServerError:
-    response = await http_client.post(
-        url=f"{BASE_API_URL}/bancho/login", json={"username": username}
+    response = await request(
+        "login", "POST", "/bancho/login", json={"username": username}
     )
 
+    if isinstance(response, ServerError):
+        return response
+
     if response.status_code >= 400:
         return ServerError(
             error_name=AdapterAPIError.LOGIN_FAILED,
@@ -41,7 +188,7 @@ async def login(username: str) -> LoginResponse | ServerError:
             in_scope_variables=dir(),
         )
 
-    return response.json()
+    return fast_json.loads(response.content)
 
 
 class ProfileResponse(TypedDict):
@@ -53,15 +200,88 @@ class ProfileResponse(TypedDict):
     pp: int
 
 
+# every profile is stored under ("user_id", id) and ("username", name)
+profile_cache: TTLCache[ProfileResponse] = TTLCache(max_size=1024, ttl=30)
+
+Gauge(
+    "profile_cache_entries",
+    "Cached profile entries, expired ones included",
+    lambda: profile_cache.stats()["size"],
+)
+LabeledGauge(
+    "profile_cache_events_total",
+    "Profile cache hits, misses and evictions",
+    label="event",
+    collect=lambda: {
+        event: count
+        for event, count in profile_cache.stats().items()
+        if event != "size"
+    },
+    kind="counter",
+)
+
+
+def invalidate_profile(user_id: int | None = None, username: str | None = None) -> None:
+    """Drop a cached profile, call it whenever the backend's copy changes"""
+
+    for key in (("user_id", user_id), ("username", username)):
+        profile = profile_cache.pop(key)
+
+        if profile is not None:
+            profile_cache.pop(("user_id", profile["user_id"]))
+            profile_cache.pop(("username", profile["username"]))
+
+
 async def get_profile(
     user_id: int | None = None,
     username: str | None = None,
-) -> ProfileResponse | ServerError:
-    response = await http_client.get(
-        url=f"{BASE_API_URL}/profile/",
+    missing_ok: bool = False,
+) -> ProfileResponse | None | ServerError:
+    """With `missing_ok` a 4xx reply returns None instead of an error,
+    for lookups that are expected to miss sometimes.
+    """
+
+    cache_key = ("user_id", user_id) if user_id is not None else ("username", username)
+
+    profile = profile_cache.get(cache_key)
+    if profile is not None:
+        return profile
+
+    profile = await fetch_profile(
+        user_id=user_id, username=username, missing_ok=missing_ok
+    )
+
+    # an outdated profile beats none while the backend is down
+    if (
+        isinstance(profile, ServerError)
+        and profile.error_name is AdapterAPIError.BACKEND_UNAVAILABLE
+    ):
+        return profile_cache.get_stale(cache_key) or profile
+
+    return profile
+
+
+# concurrent cache misses for the same profile share one request
+@single_flight
+async def fetch_profile(
+    user_id: int | None = None,
+    username: str | None = None,
+    missing_ok: bool = False,
+) -> ProfileResponse | None | ServerError:
+    response = await request(
+        "profile",
+        "GET",
+        "/profile/",
         params={"user_id": user_id, "username": username},
     )
 
+    if isinstance(response, ServerError):
+        return response
+
+    # not an error to report, the caller has another way to get the profile
+    if missing_ok and 400 <= response.status_code < 500:
+        return None
+
     if response.status_code >= 400:
         return ServerError(
             error_name=AdapterAPIError.GET_PROFILE_FAILED,
@@ -72,7 +292,12 @@ async def get_profile(
             in_scope_variables=dir(),
         )
 
-    return response.json()
+    profile = fast_json.loads(response.content)
+
+    profile_cache.set(("user_id", profile["user_id"]), profile)
+    profile_cache.set(("username", profile["username"]), profile)
+
+    return profile
 
 
 class RankFromPPResponse(TypedDict):
@@ -80,12 +305,15 @@ class RankFromPPResponse(TypedDict):
     pp: float
 
 
+@single_flight
 async def get_rank(pp: int) -> RankFromPPResponse | ServerError:
-    response = await http_client.get(
-        url=f"{BASE_API_URL}/utils/get_rank_from_pp",
-        params={"pp": pp},
+    response = await request(
+        "rank", "GET", "/utils/get_rank_from_pp", params={"pp": pp}
     )
 
+    if isinstance(response, ServerError):
+        return response
+
     if response.status_code >= 400:
         return ServerError(
             error_name=AdapterAPIError.GET_RANK_FAILED,
@@ -96,15 +324,41 @@ async def get_rank(pp: int) -> RankFromPPResponse | ServerError:
             in_scope_variables=dir(),
         )
 
-    return response.json()
+    return fast_json.loads(response.content)
+
+
+@single_flight
+async def get_rank_thresholds() -> list[RankFromPPResponse] | ServerError:
+    """Every known (pp, rank) pair, used to resolve ranks locally"""
+
+    response = await request("rank_thresholds", "GET", "/utils/rank_thresholds")
+
+    if isinstance(response, ServerError):
+        return response
+
+    if response.status_code >= 400:
+        return ServerError(
+            error_name=AdapterAPIError.GET_RANK_THRESHOLDS_FAILED,
+            message=f"Failed to get rank thresholds: {response.text}",
+            file_location=__file__,
+            line=ServerError.get_current_line(),
+            local_variables=locals(),
+            in_scope_variables=dir(),
+        )
+
+    return fast_json.loads(response.content)
 
 
 async def logout(user_id: int) -> None | ServerError:
-    response = await http_client.post(
-        url=f"{BASE_API_URL}/bancho/logout",
-        json={"user_id": user_id},
+    invalidate_profile(user_id=user_id)
+
+    response = await request(
+        "logout", "POST", "/bancho/logout", json={"user_id": user_id}
     )
 
+    if isinstance(response, ServerError):
+        return response
+
     if response.status_code >= 400:
         return ServerError(
             error_name=AdapterAPIError.LOGOUT_FAILED,
@@ -1 +1,11 @@
-from . import game_mode, log
+from . import (
+    cache,
+    circuit_breaker,
+    fast_json,
+    game_mode,
+    http,
+    log,
+    metrics,
+    profiler,
+    single_flight,
+)
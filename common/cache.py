@@ -0,0 +1,71 @@
+import time
+from collections import OrderedDict
+from typing import Generic, Hashable, TypeVar
+
+V = TypeVar("V")
+
+
+class TTLCache(Generic[V]):
+    """Bounded LRU cache whose entries also expire `ttl` seconds after being set"""
+
+    def __init__(self, max_size: int, ttl: float) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+
+        # key -> (expiry time, value), least recently used first
+        self.entries: OrderedDict[Hashable, tuple[float, V]] = OrderedDict()
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self.entries)
+
+    def get(self, key: Hashable) -> V | None:
+        entry = self.entries.get(key)
+
+        if entry is None:
+            self.misses += 1
+            return None
+
+        expires_at, value = entry
+
+        # expired entries are kept until evicted, see get_stale
+        if expires_at < time.monotonic():
+            self.misses += 1
+            return None
+
+        self.entries.move_to_end(key)
+        self.hits += 1
+
+        return value
+
+    def get_stale(self, key: Hashable) -> V | None:
+        """The cached value even if it expired, for when fresh data can't be had"""
+
+        entry = self.entries.get(key)
+        return entry[1] if entry is not None else None
+
+    def set(self, key: Hashable, value: V) -> None:
+        self.entries[key] = (time.monotonic() + self.ttl, value)
+        self.entries.move_to_end(key)
+
+        while len(self.entries) > self.max_size:
+            self.entries.popitem(last=False)
+            self.evictions += 1
+
+    def pop(self, key: Hashable) -> V | None:
+        entry = self.entries.pop(key, None)
+        return entry[1] if entry is not None else None
+
+    def clear(self) -> None:
+        self.entries.clear()
+
+    def stats(self) -> dict[str, int]:
+        return {
+            "size": len(self.entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
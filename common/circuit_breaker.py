@@ -0,0 +1,53 @@
+import time
+from enum import Enum
+
+
+class CircuitState(Enum):
+    CLOSED = "CLOSED"
+    OPEN = "OPEN"
+    HALF_OPEN = "HALF_OPEN"
+
+
+class CircuitBreaker:
+    """Stops calling a failing dependency for a while.
+
+    After `failure_threshold` consecutive failures the circuit opens and every
+    call is refused. Once `reset_timeout` seconds have passed a single trial
+    call is let through, its outcome closes or re-opens the circuit.
+    """
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 10.0) -> None:
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+        self.opened_at = 0.0
+
+    def allow_request(self) -> bool:
+        if self.state is CircuitState.CLOSED:
+            return True
+
+        # open: wait out the reset timeout
+        # half open: wait for the trial call, or give up on it after the same timeout
+        if time.monotonic() - self.opened_at < self.reset_timeout:
+            return False
+
+        # let one trial call through
+        self.state = CircuitState.HALF_OPEN
+        self.opened_at = time.monotonic()
+        return True
+
+    def record_success(self) -> None:
+        self.state = CircuitState.CLOSED
+        self.failures = 0
+
+    def record_failure(self) -> None:
+        self.failures += 1
+
+        if (
+            self.state is CircuitState.HALF_OPEN
+            or self.failures >= self.failure_threshold
+        ):
+            self.state = CircuitState.OPEN
+            self.opened_at = time.monotonic()
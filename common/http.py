@@ -0,0 +1,51 @@
+from httpx import AsyncClient, Limits, Timeout
+
+from common.log import LogTypes, log
+
+# every backend call goes to localhost, a few warm connections are plenty
+LIMITS = Limits(max_connections=32, max_keepalive_connections=16, keepalive_expiry=60)
+
+# default for calls that don't pass their own timeout
+TIMEOUT = Timeout(5.0, connect=1.0)
+
+http_client: AsyncClient | None = None
+
+
+def create_http_client(http2: bool = False) -> AsyncClient:
+    if http2:
+        try:
+            import h2  # noqa: F401
+        except ImportError:
+            log("h2 is not installed, falling back to HTTP/1.1", LogTypes.WARNING)
+            http2 = False
+
+    return AsyncClient(limits=LIMITS, timeout=TIMEOUT, http2=http2)
+
+
+def get_http_client() -> AsyncClient:
+    """The client shared by every adapter and repository"""
+
+    global http_client
+
+    # created on first use when running outside of the app's lifespan
+    if http_client is None:
+        http_client = create_http_client()
+
+    return http_client
+
+
+async def open_http_client(http2: bool = False) -> AsyncClient:
+    global http_client
+
+    await close_http_client()
+    http_client = create_http_client(http2=http2)
+
+    return http_client
+
+
+async def close_http_client() -> None:
+    global http_client
+
+    if http_client is not None:
+        await http_client.aclose()
+        http_client = None
@@ -1,5 +1,10 @@
+import atexit
+import json
 import logging
+import queue
+import sys
 from enum import Enum
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 
 from colorama import Fore as Colors
 from colorama import Style
@@ -9,22 +14,23 @@ colorama_init()
 
 logger: logging.Logger = None  # type: ignore
 
+# writes the queued records from a background thread, so logging never blocks the loop
+listener: QueueListener | None = None
 
-def setup_logging() -> logging.Logger:
+# created by the first setup_logging, attached to the root logger while logging runs
+queue_handler: QueueHandler | None = None
+file_handler: RotatingFileHandler | None = None
 
-    logging.basicConfig(
-        filename="log.log",
-        format="%(asctime)s %(message)s",
-        filemode="w",
-    )
+LOG_FILE = "log.log"
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUPS = 3
 
-    logger = logging.getLogger()
+# third party loggers that trace every step of every request at debug level,
+# raised so those records are never built
+QUIET_LOGGERS = {"httpcore": logging.INFO}
 
-    logger.setLevel(logging.DEBUG)
-
-    logger.info("Logging setup")
-
-    return logger
+SUCCESS = 25
+logging.addLevelName(SUCCESS, "SUCCESS")
 
 
 class LogTypes(Enum):
@@ -34,12 +40,156 @@ class LogTypes(Enum):
     SUCCESS = "SUCCESS"
 
 
-def log(message: str, type: LogTypes) -> None:
-    if type == LogTypes.ERROR:
-        print(Colors.RED + "ERROR: " + message + Style.RESET_ALL)
-    elif type == LogTypes.WARNING:
-        print(Colors.YELLOW + "WARNING: " + message + Style.RESET_ALL)
-    elif type == LogTypes.SUCCESS:
-        print(Colors.GREEN + "SUCCESS: " + message + Style.RESET_ALL)
+LOG_LEVELS = {
+    LogTypes.INFO: logging.INFO,
+    LogTypes.ERROR: logging.ERROR,
+    LogTypes.WARNING: logging.WARNING,
+    LogTypes.SUCCESS: SUCCESS,
+}
+
+LOG_COLORS = {
+    LogTypes.INFO: "",
+    LogTypes.ERROR: Colors.RED,
+    LogTypes.WARNING: Colors.YELLOW,
+    LogTypes.SUCCESS: Colors.GREEN,
+}
+
+
+class ConsoleFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        log_type: LogTypes = record.log_type  # type: ignore
+        message = f"{log_type.value}: {record.getMessage()}"
+
+        if not LOG_COLORS[log_type]:
+            return message
+
+        return LOG_COLORS[log_type] + message + Style.RESET_ALL
+
+
+class LazyQueueHandler(QueueHandler):
+    """Queues records with their message resolved, the writer thread does the rest.
+
+    `msg % args` runs here, on the logging thread, so args that change later or
+    whose `__repr__` isn't thread safe are captured as they were when logged.
+    Only records that passed the level checks get here.
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.msg = record.getMessage()
+        record.args = None
+
+        return record
+
+
+class JSONLineFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        line = {
+            "time": self.formatTime(record),
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+        }
+
+        if record.exc_info:
+            line["exception"] = self.formatException(record.exc_info)
+
+        return json.dumps(line)
+
+
+def setup_logging(
+    level: int = logging.DEBUG, json_lines: bool = False
+) -> logging.Logger:
+    """Route every log record through a queue to a background writer thread.
+
+    The file rotates by size, the console only shows messages sent with `log`.
+    A setup after `stop_logging` reuses the handlers and log file of the first one.
+    """
+
+    global logger, listener, queue_handler, file_handler
+
+    root = logging.getLogger()
+
+    if queue_handler is not None and queue_handler in root.handlers:
+        return logger
+
+    if queue_handler is None:
+        file_handler = RotatingFileHandler(
+            LOG_FILE, maxBytes=LOG_FILE_MAX_BYTES, backupCount=LOG_FILE_BACKUPS
+        )
+        # a fresh file per run, the previous one is kept as a backup
+        file_handler.doRollover()
+
+        console_handler = logging.StreamHandler(sys.stdout)
+        console_handler.setFormatter(ConsoleFormatter())
+        console_handler.addFilter(lambda record: hasattr(record, "log_type"))
+
+        log_queue: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+
+        listener = QueueListener(
+            log_queue, file_handler, console_handler, respect_handler_level=True
+        )
+        queue_handler = LazyQueueHandler(log_queue)
+
+        atexit.register(stop_logging)
+
+    assert listener is not None and file_handler is not None
+
+    if json_lines:
+        file_handler.setFormatter(JSONLineFormatter())
     else:
-        print("INFO: " + message)
+        file_handler.setFormatter(logging.Formatter("%(asctime)s %(message)s"))
+
+    listener.start()
+
+    logger = root
+    logger.addHandler(queue_handler)
+    logger.setLevel(level)
+
+    for name, quiet_level in QUIET_LOGGERS.items():
+        logging.getLogger(name).setLevel(max(level, quiet_level))
+
+    logger.info("Logging setup")
+
+    return logger
+
+
+def stop_logging() -> None:
+    """Write out whatever is still queued and stop the writer thread.
+
+    The queue handler is detached first, so nothing is queued that no thread
+    reads. A later `log` call sets logging up again.
+    """
+
+    global logger
+
+    if queue_handler is None or queue_handler not in logging.getLogger().handlers:
+        return
+
+    logging.getLogger().removeHandler(queue_handler)
+
+    assert listener is not None
+    listener.stop()
+
+    logger = None  # type: ignore
+
+
+def is_enabled(type: LogTypes) -> bool:
+    """Whether messages of `type` are logged, check it before building costly ones"""
+
+    if logger is None:
+        setup_logging()
+
+    return logger.isEnabledFor(LOG_LEVELS[type])
+
+
+def log(message: str, type: LogTypes, *args: object) -> None:
+    """Log to the console and the log file.
+
+    `args` are only %-formatted into `message` if the level is enabled.
+    """
+
+    # checked before anything is formatted
+    if not is_enabled(type):
+        return
+
+    logger.log(LOG_LEVELS[type], message, *args, extra={"log_type": type})
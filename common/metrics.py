@@ -0,0 +1,178 @@
+from abc import ABC, abstractmethod
+from bisect import bisect_left
+from enum import IntEnum
+from typing import Callable, Iterator, Mapping
+
+# seconds, for backend calls
+LATENCY_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+# seconds, for work done in process like scanning for osu!
+FAST_LATENCY_BUCKETS = (0.0001, 0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0)
+
+
+class Metric(ABC):
+    """Base of every metric, registers itself for `render` on creation.
+
+    Metrics are plain ints and floats without locks, they are only ever
+    updated from the event loop.
+    """
+
+    kind = "untyped"
+
+    def __init__(self, name: str, help: str) -> None:
+        self.name = name
+        self.help = help
+
+        registry.append(self)
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        ...
+
+    def render(self) -> str:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.kind}"]
+        lines.extend(self.samples())
+
+        return "\n".join(lines)
+
+
+registry: list[Metric] = []
+
+
+class PacketCounter(Metric):
+    """A counter per packet id, stored in a list indexed by the id"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str, packet_ids: type[IntEnum]) -> None:
+        super().__init__(name, help)
+
+        self.packet_ids = packet_ids
+        self.values: list[float] = [0] * (max(packet_ids) + 1)
+
+    def inc(self, packet_id: int, amount: float = 1) -> None:
+        self.values[packet_id] += amount
+
+    def samples(self) -> Iterator[str]:
+        for packet_id in self.packet_ids:
+            if self.values[packet_id]:
+                yield f'{self.name}{{packet="{packet_id.name}"}} {self.values[packet_id]}'
+
+
+class Counter(Metric):
+    """A single counter without labels"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, help: str) -> None:
+        super().__init__(name, help)
+
+        self.value: float = 0
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def samples(self) -> Iterator[str]:
+        yield f"{self.name} {self.value}"
+
+
+class Gauge(Metric):
+    """A value read from `collect` whenever the metrics are rendered"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, help: str, collect: Callable[[], float]) -> None:
+        super().__init__(name, help)
+
+        self.collect = collect
+
+    def samples(self) -> Iterator[str]:
+        yield f"{self.name} {self.collect()}"
+
+
+class LabeledGauge(Metric):
+    """Values per label read from `collect` whenever the metrics are rendered.
+
+    `kind` is "counter" for values that only ever grow, e.g. a `Counter` of errors.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label: str,
+        collect: Callable[[], Mapping[str, float]],
+        kind: str = "gauge",
+    ) -> None:
+        super().__init__(name, help)
+
+        self.label = label
+        self.collect = collect
+        self.kind = kind
+
+    def samples(self) -> Iterator[str]:
+        for label_value, value in self.collect().items():
+            yield f'{self.name}{{{self.label}="{label_value}"}} {value}'
+
+
+class Histogram:
+    __slots__ = ("buckets", "counts", "sum", "count")
+
+    def __init__(self, buckets: tuple[float, ...]) -> None:
+        self.buckets = buckets
+
+        # per bucket, not cumulative, the last one is +Inf
+        self.counts = [0] * (len(buckets) + 1)
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class LabeledHistogram(Metric):
+    """One histogram per value of a single label"""
+
+    kind = "histogram"
+
+    def __init__(
+        self,
+        name: str,
+        help: str,
+        label: str,
+        buckets: tuple[float, ...] = LATENCY_BUCKETS,
+    ) -> None:
+        super().__init__(name, help)
+
+        self.label = label
+        self.buckets = buckets
+        self.histograms: dict[str, Histogram] = {}
+
+    def observe(self, label_value: str, value: float) -> None:
+        histogram = self.histograms.get(label_value)
+
+        if histogram is None:
+            histogram = self.histograms[label_value] = Histogram(self.buckets)
+
+        histogram.observe(value)
+
+    def samples(self) -> Iterator[str]:
+        for label_value, histogram in self.histograms.items():
+            label = f'{self.label}="{label_value}"'
+
+            cumulative = 0
+            for bound, count in zip(self.buckets, histogram.counts):
+                cumulative += count
+                yield f'{self.name}_bucket{{{label},le="{bound}"}} {cumulative}'
+
+            yield f'{self.name}_bucket{{{label},le="+Inf"}} {histogram.count}'
+            yield f"{self.name}_sum{{{label}}} {histogram.sum}"
+            yield f"{self.name}_count{{{label}}} {histogram.count}"
+
+
+def render() -> str:
+    """Every registered metric in the Prometheus text format"""
+
+    return "\n".join(metric.render() for metric in registry) + "\n"
@@ -0,0 +1,228 @@
+import cProfile
+import marshal
+import os
+import pstats
+import time
+from fnmatch import fnmatchcase
+
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+# requests to these paths are never profiled, they control the profiler
+PROFILER_PATH_PREFIX = "/application/profiler"
+
+# collapsed stacks deeper than this are cut off
+MAX_STACK_DEPTH = 64
+
+# microseconds, stacks that took less are left out of the collapsed output
+MIN_STACK_MICROSECONDS = 1
+
+
+class RequestProfiler:
+    """Runs cProfile for the next `requests` requests or the next `seconds`.
+
+    Only requests whose path matches `route` (a glob, e.g. `/c*`) are counted.
+    The profiler is enabled while at least one counted request is in flight,
+    requests run concurrently so whatever else the loop does meanwhile shows up too.
+    """
+
+    def __init__(self) -> None:
+        self.profile: cProfile.Profile | None = None
+        self.running = False
+
+        self.route: str | None = None
+        self.remaining_requests: int | None = None
+        self.until: float | None = None
+
+        self.in_flight = 0
+        self.profiled_requests = 0
+
+    def start(
+        self,
+        requests: int | None = None,
+        seconds: float | None = None,
+        route: str | None = None,
+    ) -> None:
+        """Start a new profile, discarding the previous one"""
+
+        self.stop()
+
+        self.profile = cProfile.Profile()
+        self.running = True
+
+        self.route = route
+        self.remaining_requests = requests
+        self.until = time.monotonic() + seconds if seconds is not None else None
+
+        self.profiled_requests = 0
+
+    def stop(self) -> None:
+        """Stop counting requests, what was collected so far is kept"""
+
+        self.running = False
+
+        if self.in_flight and self.profile is not None:
+            self.profile.disable()
+
+        self.in_flight = 0
+
+    def should_profile(self, path: str) -> bool:
+        if not self.running:
+            return False
+
+        if self.until is not None and time.monotonic() >= self.until:
+            self.running = False
+            return False
+
+        if path.startswith(PROFILER_PATH_PREFIX):
+            return False
+
+        return self.route is None or fnmatchcase(path, self.route)
+
+    def begin(self) -> cProfile.Profile:
+        """Count a request as profiled, enabling the profiler if it's the first in flight"""
+
+        assert self.profile is not None
+
+        if self.in_flight == 0:
+            self.profile.enable()
+
+        self.in_flight += 1
+        self.profiled_requests += 1
+
+        if self.remaining_requests is not None:
+            self.remaining_requests -= 1
+
+            if self.remaining_requests <= 0:
+                self.running = False
+
+        return self.profile
+
+    def end(self, profile: cProfile.Profile) -> None:
+        # the profile was restarted or stopped while the request ran
+        if profile is not self.profile or self.in_flight == 0:
+            return
+
+        self.in_flight -= 1
+
+        if self.in_flight == 0:
+            profile.disable()
+
+    def status(self) -> dict[str, object]:
+        # an expired time window is only noticed by the next request otherwise
+        if self.running and self.until is not None and time.monotonic() >= self.until:
+            self.running = False
+
+        return {
+            "running": self.running,
+            "route": self.route,
+            "remaining_requests": self.remaining_requests,
+            "seconds_left": (
+                max(0.0, self.until - time.monotonic())
+                if self.running and self.until is not None
+                else None
+            ),
+            "in_flight": self.in_flight,
+            "profiled_requests": self.profiled_requests,
+        }
+
+    def get_stats(self) -> pstats.Stats | None:
+        if self.profile is None or self.profiled_requests == 0:
+            return None
+
+        # building the stats disables the profiler, requests may still be in flight
+        stats = pstats.Stats(self.profile)
+
+        if self.in_flight:
+            self.profile.enable()
+
+        return stats
+
+
+request_profiler = RequestProfiler()
+
+
+def dump_pstats(stats: pstats.Stats) -> bytes:
+    """The same bytes `Stats.dump_stats` writes, loadable with `pstats.Stats(path)`"""
+
+    return marshal.dumps(stats.stats)  # type: ignore[attr-defined]
+
+
+def format_function(function: tuple[str, int, str]) -> str:
+    filename, line, name = function
+
+    # built-ins have no file
+    if filename == "~":
+        return name
+
+    return f"{name} ({os.path.basename(filename)}:{line})"
+
+
+def collapse_stacks(stats: pstats.Stats) -> str:
+    """Collapsed stacks (`a;b;c <microseconds>`) for flame graph tools.
+
+    cProfile only records caller -> callee edges, so the time of a function
+    is split between its callers by the time it spent under each of them.
+    """
+
+    functions = stats.stats  # type: ignore[attr-defined]
+
+    callees: dict[tuple, list[tuple[tuple, float]]] = {}
+    for function, (_, _, _, _, callers) in functions.items():
+        for caller, (_, _, _, caller_cumulative_time) in callers.items():
+            callees.setdefault(caller, []).append((function, caller_cumulative_time))
+
+    lines: dict[str, float] = {}
+
+    def walk(function: tuple, stack: list[str], share: float) -> None:
+        _, _, total_time, cumulative_time, _ = functions[function]
+
+        stack.append(format_function(function))
+
+        self_time = total_time * share * 1_000_000
+        if self_time >= MIN_STACK_MICROSECONDS:
+            key = ";".join(stack)
+            lines[key] = lines.get(key, 0) + self_time
+
+        if len(stack) < MAX_STACK_DEPTH:
+            for callee, time_under_caller in callees.get(function, []):
+                callee_time = time_under_caller * share
+                callee_cumulative_time = functions[callee][3]
+
+                if (
+                    callee_time * 1_000_000 < MIN_STACK_MICROSECONDS
+                    or not callee_cumulative_time
+                    or format_function(callee) in stack  # recursion
+                ):
+                    continue
+
+                walk(callee, stack, callee_time / callee_cumulative_time)
+
+        stack.pop()
+
+    for function, (_, _, _, _, callers) in functions.items():
+        if not callers:
+            walk(function, [], 1.0)
+
+    return "".join(
+        f"{stack} {round(microseconds)}\n" for stack, microseconds in lines.items()
+    )
+
+
+class ProfilerMiddleware:
+    """Runs the requests picked by `request_profiler` under the profiler"""
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or not request_profiler.should_profile(
+            scope["path"]
+        ):
+            return await self.app(scope, receive, send)
+
+        profile = request_profiler.begin()
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            request_profiler.end(profile)
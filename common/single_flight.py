@@ -0,0 +1,52 @@
+import asyncio
+from functools import partial, wraps
+from typing import Any, Callable, Coroutine, Generic, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class SingleFlight(Generic[T]):
+    """Runs one call per key at a time, concurrent callers of a key share its result.
+
+    Exceptions reach every caller. A caller being cancelled doesn't cancel the
+    shared call for the others.
+    """
+
+    def __init__(self) -> None:
+        self.calls: dict[Hashable, asyncio.Task[T]] = {}
+
+    def __len__(self) -> int:
+        return len(self.calls)
+
+    async def run(self, key: Hashable, call: Callable[[], Coroutine[Any, Any, T]]) -> T:
+        task = self.calls.get(key)
+
+        if task is None:
+            task = asyncio.ensure_future(call())
+            task.add_done_callback(partial(self._finished, key))
+            self.calls[key] = task
+
+        return await asyncio.shield(task)
+
+    def _finished(self, key: Hashable, task: asyncio.Task[T]) -> None:
+        if self.calls.get(key) is task:
+            del self.calls[key]
+
+        # every waiter may be gone, don't warn about an unretrieved exception
+        if not task.cancelled():
+            task.exception()
+
+
+def single_flight(
+    func: Callable[..., Coroutine[Any, Any, T]]
+) -> Callable[..., Coroutine[Any, Any, T]]:
+    """Coalesce concurrent calls of `func` made with the same (hashable) arguments"""
+
+    flight: SingleFlight[T] = SingleFlight()
+
+    @wraps(func)
+    async def wrapper(*args: Any, **kwargs: Any) -> T:
+        key = (args, tuple(sorted(kwargs.items())))
+        return await flight.run(key, partial(func, *args, **kwargs))
+
+    return wrapper
@@ -1,2 +1,2 @@
 from .application import application_router
-from .bancho import bancho_router
+from .bancho import BanchoASGIApp, bancho_router
@@ -1,22 +1,30 @@
-from fastapi.responses import JSONResponse
+from typing import Literal
+
+from fastapi.responses import PlainTextResponse, Response
 from fastapi.routing import APIRouter
 
 import usecases
+from common import metrics
+from common.fast_json import FastJSONResponse
 from errors import ServerError
 
-application_router = APIRouter(prefix="/application", tags=["osu! client"])
+application_router = APIRouter(
+    prefix="/application",
+    tags=["osu! client"],
+    default_response_class=FastJSONResponse,
+)
 
 
 @application_router.post("/kill")
 async def kill_osu():
     response = usecases.application.kill_osu()
     if isinstance(response, ServerError):
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=response.status_code,
             content=response.to_dict(),
         )
 
-    return JSONResponse(status_code=200, content=response)
+    return FastJSONResponse(status_code=200, content=response)
 
 
 @application_router.get("/path")
@@ -24,21 +32,80 @@ async def get_path():
     response = usecases.application.get_osu_folder_path()
 
     if isinstance(response, ServerError):
-        return JSONResponse(
+        return FastJSONResponse(
             status_code=response.status_code,
             content=response.to_dict(),
         )
 
-    return JSONResponse(status_code=200, content=response)
+    return FastJSONResponse(status_code=200, content=response)
 
 
 @application_router.post("/launch")
 async def launch_osu():
     response = await usecases.application.launch_osu()
     if isinstance(response, ServerError):
-        return JSONResponse(
+        return FastJSONResponse(
+            status_code=response.status_code,
+            content=response.to_dict(),
+        )
+
+    return FastJSONResponse(status_code=200, content=response)
+
+
+@application_router.get("/metrics")
+async def get_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(
+        content=metrics.render(), media_type="text/plain; version=0.0.4"
+    )
+
+
+@application_router.post("/profiler/start")
+async def start_profiler(
+    requests: int | None = None,
+    seconds: float | None = None,
+    route: str | None = None,
+):
+    # e.g. ?requests=50&route=/c* or ?seconds=30
+    response = usecases.profiler.start_profiling(
+        requests=requests, seconds=seconds, route=route
+    )
+
+    return FastJSONResponse(status_code=200, content=response)
+
+
+@application_router.post("/profiler/stop")
+async def stop_profiler():
+    response = usecases.profiler.stop_profiling()
+
+    return FastJSONResponse(status_code=200, content=response)
+
+
+@application_router.get("/profiler")
+async def get_profiler_status():
+    response = usecases.profiler.get_profiler_status()
+
+    return FastJSONResponse(status_code=200, content=response)
+
+
+@application_router.get("/profiler/profile")
+async def get_profile(format: Literal["pstats", "collapsed"] = "pstats"):
+    response = usecases.profiler.get_profile(format)
+
+    if isinstance(response, ServerError):
+        return FastJSONResponse(
             status_code=response.status_code,
             content=response.to_dict(),
         )
 
-    return JSONResponse(status_code=200, content=response)
+    if format == "pstats":
+        return Response(
+            content=response,
+            media_type="application/octet-stream",
+            headers={"Content-Disposition": 'attachment; filename="profile.pstats"'},
+        )
+
+    return PlainTextResponse(
+        content=response,
+        headers={"Content-Disposition": 'attachment; filename="profile.collapsed"'},
+    )
@@ -1,18 +1,106 @@
 import asyncio
-from typing import Literal
+from collections import Counter
+from typing import Awaitable, Callable, Literal
 
 from fastapi import BackgroundTasks, Header, Request, Response
 from fastapi.routing import APIRouter
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 
+import packets.reading as packet_reading
 import usecases
+from common.metrics import LabeledGauge, PacketCounter
+from packets.writing import ClientPacketIDS, PacketWriter, RestartPacket
+from repositories.sessions import Session
 
 bancho_router = APIRouter(tags=["Bancho (c* subdomains)"])
 
+# handlers get the sender's session, the packet payload and the poll's reply writer
+PacketHandler = Callable[[Session, memoryview, PacketWriter], Awaitable[None]]
+
+# indexed by packet id, None where no handler is registered
+packet_handlers: list[PacketHandler | None] = [None] * (max(ClientPacketIDS) + 1)
+
+# packet ids received without a handler, by id
+unhandled_packets: Counter[int] = Counter()
+
+
+def unhandled_packet_counts() -> dict[str, int]:
+    # ids the client enum doesn't know keep their number
+    names = {packet_id.value: packet_id.name for packet_id in ClientPacketIDS}
+
+    return {
+        names.get(packet_id, str(packet_id)): count
+        for packet_id, count in unhandled_packets.items()
+    }
+
+
+LabeledGauge(
+    "bancho_packets_unhandled_total",
+    "Client packets received without a handler",
+    label="packet",
+    collect=unhandled_packet_counts,
+    kind="counter",
+)
+
+packets_decoded = PacketCounter(
+    "bancho_packets_decoded_total",
+    "Client packets read from polls",
+    ClientPacketIDS,
+)
+packet_bytes_decoded = PacketCounter(
+    "bancho_packet_bytes_decoded_total",
+    "Payload bytes of client packets read from polls",
+    ClientPacketIDS,
+)
+packets_handled = PacketCounter(
+    "bancho_packets_handled_total",
+    "Client packets passed to a handler",
+    ClientPacketIDS,
+)
+
+# seconds a poll with nothing to reply is held open waiting for packets,
+# 0 answers every poll immediately
+LONG_POLL_TIMEOUT: float = 0.0
+
+
+def register_packet(
+    packet_id: ClientPacketIDS,
+) -> Callable[[PacketHandler], PacketHandler]:
+    def wrapper(handler: PacketHandler) -> PacketHandler:
+        packet_handlers[packet_id] = handler
+        return handler
+
+    return wrapper
+
+
+async def handle_packets(
+    session: Session, body: bytes, packet_writer: PacketWriter
+) -> None:
+    """Run the handler of every packet in the poll body, in order"""
+
+    for packet_id, data in packet_reading.iter_packets(body):
+        # ids past the known ones have neither a handler nor a counter
+        if packet_id >= len(packet_handlers):
+            unhandled_packets[packet_id] += 1
+            continue
+
+        packets_decoded.inc(packet_id)
+        packet_bytes_decoded.inc(packet_id, len(data))
+
+        handler = packet_handlers[packet_id]
+
+        if handler is None:
+            unhandled_packets[packet_id] += 1
+            continue
+
+        await handler(session, data, packet_writer)
+
+        packets_handled.inc(packet_id)
+
+
 # TODO: Handle `CHANGE_ACTION`
 # TODO: Handle `SEND_PUBLIC_MESSAGE`
-# TODO: Handle `LOGOUT`
 # TODO: Handle `REQUEST_STATUS_UPDATE`
-# TODO: Handle `PING`
 # TODO: Handle `START_SPECTATING`
 # TODO: Handle `STOP_SPECTATING`
 # TODO: Handle `SPECTATE_FRAMES`
@@ -59,21 +147,148 @@ bancho_router = APIRouter(tags=["Bancho (c* subdomains)"])
 # TODO: Handle `TOURNAMENT_LEAVE_MATCH_CHANNEL`
 
 
+async def wait_for_packets(session: Session) -> None:
+    """Hold the poll open until something is queued for the session"""
+
+    try:
+        await asyncio.wait_for(
+            session.packet_queue.has_packets.wait(), timeout=LONG_POLL_TIMEOUT
+        )
+    except asyncio.TimeoutError:
+        pass
+
+
+async def handle_bancho_request(
+    osu_token: str | None, body: bytes
+) -> tuple[memoryview, dict[str, str]]:
+    """Build the reply body and headers for one bancho request"""
+
+    packet_writer = PacketWriter()
+
+    if osu_token is None:  # not logged in, login
+        response = await usecases.bancho.login(raw_login_data=body)
+
+        packet_writer.write_many(response["packets"])
+
+        return packet_writer.getvalue(), {"cho-token": response["osu_token"]}
+
+    session = usecases.bancho.get_session(osu_token)
+
+    if session is None:
+        # unknown token (e.g. after a restart), make the client log in again
+        packet_writer.write(RestartPacket(milliseconds=0))
+        return packet_writer.getvalue(), {}
+
+    session.touch()
+
+    await handle_packets(session, body, packet_writer)
+
+    if LONG_POLL_TIMEOUT and not packet_writer and not session.packet_queue:
+        await wait_for_packets(session)
+
+    # whatever was queued for the session goes out with this poll
+    session.packet_queue.drain_into(packet_writer)
+
+    return packet_writer.getvalue(), {}
+
+
 @bancho_router.post("/")
 async def bancho_handler(
     request: Request,
     osu_token: str | None = Header(None),
     user_agent: Literal["osu!"] = Header(...),
 ):
-    if osu_token is None:  # not logged in, login
-        response = await usecases.bancho.login(raw_login_data=await request.body())
+    content, headers = await handle_bancho_request(osu_token, await request.body())
+
+    # starlette only renders bytes or str,
+    # the zero-copy view is only kept on the ASGI fast path
+    return Response(content=bytes(content), headers=headers)
+
+
+BANCHO_SUBDOMAINS = ("c", "ce", "c4", "c5", "c6")
+
+
+class BanchoASGIApp:
+    """Serves bancho requests straight from ASGI, everything else goes to `app`.
+
+    Requests are matched by path prefix (`/c/`, `/ce/`, ...) or by host
+    (`c.<domain>/`, `ce.<domain>/`, ...) and skip routing, dependency
+    injection, header validation and middlewares.
+    Anything that doesn't look like an osu! client is left to `app`.
+    """
+
+    def __init__(self, app: ASGIApp) -> None:
+        self.app = app
+
+        self.paths = {f"/{subdomain}/" for subdomain in BANCHO_SUBDOMAINS}
+        self.hosts = {subdomain.encode() for subdomain in BANCHO_SUBDOMAINS}
 
-        raw_packets = b"".join(
-            [packet.to_bancho_protocol() for packet in response["packets"]]
+    def is_bancho_request(self, scope: Scope, host: bytes | None) -> bool:
+        if scope["path"] in self.paths:
+            return True
+
+        return (
+            scope["path"] == "/"
+            and host is not None
+            and host.split(b".", 1)[0] in self.hosts
+        )
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http" or scope["method"] != "POST":
+            return await self.app(scope, receive, send)
+
+        host = user_agent = osu_token = None
+
+        for name, value in scope["headers"]:
+            if name == b"host":
+                host = value
+            elif name == b"user-agent":
+                user_agent = value
+            elif name == b"osu-token":
+                osu_token = value
+
+        if user_agent != b"osu!" or not self.is_bancho_request(scope, host):
+            return await self.app(scope, receive, send)
+
+        body = await self.read_body(receive)
+
+        content, headers = await handle_bancho_request(
+            osu_token.decode() if osu_token is not None else None, body
         )
 
-        return Response(
-            content=raw_packets, headers={"cho-token": response["osu_token"]}
+        raw_headers = [(b"content-length", str(len(content)).encode())]
+        for name, value in headers.items():
+            raw_headers.append((name.encode(), value.encode()))
+
+        await send(
+            {"type": "http.response.start", "status": 200, "headers": raw_headers}
         )
+        await send({"type": "http.response.body", "body": content})
+
+    @staticmethod
+    async def read_body(receive: Receive) -> bytes:
+        message: Message = await receive()
+
+        # polls almost always arrive in a single message
+        if not message.get("more_body", False):
+            return message.get("body", b"")
+
+        chunks = [message.get("body", b"")]
+        while message.get("more_body", False):
+            message = await receive()
+            chunks.append(message.get("body", b""))
+
+        return b"".join(chunks)
+
+
+@register_packet(ClientPacketIDS.PING)
+async def ping(session: Session, data: memoryview, packet_writer: PacketWriter) -> None:
+    # the client only pings to keep the connection alive
+    return None
+
 
-    # TODO: handle packets
+@register_packet(ClientPacketIDS.LOGOUT)
+async def logout(
+    session: Session, data: memoryview, packet_writer: PacketWriter
+) -> None:
+    await usecases.bancho.logout(session)
@@ -1 +1 @@
-from . import client
+from . import client, config, ranks, sessions
@@ -1,30 +1,20 @@
-import asyncio
-
 import usecases
 from common.log import LogTypes, log
 
-USER_ID: int | None = None
-
 
-async def check_if_client_is_closed() -> None:
-    global USER_ID
+async def watch_client_exit() -> None:
     while True:
-        if usecases.application.is_client_running():
-            # log("Client is running, waiting 2 seconds", LogTypes.INFO)
-            await asyncio.sleep(2)
-            continue
+        # nothing to watch while no one is logged in
+        await usecases.bancho.wait_for_sessions()
 
-        if USER_ID is None:
-            # log("Client is closed, but no user is logged in", LogTypes.INFO)
-            await asyncio.sleep(2)
-            continue
+        # returns right away if the client isn't running
+        await usecases.application.wait_for_client_exit()
 
-        # if it is not running, we gotta log the user out and close the session
+        # it is not running, we gotta log the user out and close the session
 
         log("Client is closed, logging out user", LogTypes.INFO)
 
-        await usecases.bancho.logout(USER_ID)
-
-        log("User logged out, resetting user id", LogTypes.SUCCESS)
+        for session in usecases.bancho.get_sessions():
+            await usecases.bancho.logout(session)
 
-        USER_ID = None
+        log("User logged out, sessions closed", LogTypes.SUCCESS)
@@ -0,0 +1,26 @@
+import asyncio
+
+import usecases
+from errors import ServerError
+
+# seconds between revalidations of the cached launcher config
+CONFIG_REFRESH_INTERVAL = 30
+
+# seconds, the longest wait between refreshes while no config could be fetched
+CONFIG_MAX_REFRESH_INTERVAL = 300
+
+
+async def refresh_config() -> None:
+    interval = CONFIG_REFRESH_INTERVAL
+
+    while True:
+        # an unchanged config costs a 304, changes reach the subscribers
+        config = await usecases.config.refresh_config()
+
+        # every failure is logged with its locals, back off while the api is down
+        if isinstance(config, ServerError):
+            interval = min(interval * 2, CONFIG_MAX_REFRESH_INTERVAL)
+        else:
+            interval = CONFIG_REFRESH_INTERVAL
+
+        await asyncio.sleep(interval)
@@ -0,0 +1,30 @@
+import asyncio
+
+import usecases
+from common.log import LogTypes, log
+
+# seconds before the first retry of a failed load, doubled for every further one
+RANK_INDEX_RETRY_DELAY = 5
+
+# seconds, the longest wait between two retries
+RANK_INDEX_MAX_RETRY_DELAY = 300
+
+
+async def load_rank_index() -> None:
+    """Load the rank index, retrying until the api serves it.
+
+    The api may start after this service. Until the index is loaded, ranks
+    come from the api one pp value at a time.
+    """
+
+    delay = RANK_INDEX_RETRY_DELAY
+
+    while not await usecases.ranks.load_rank_index():
+        log(
+            f"Rank index not loaded, ranks come from the api, retrying in {delay}s",
+            LogTypes.WARNING,
+        )
+
+        await asyncio.sleep(delay)
+
+        delay = min(delay * 2, RANK_INDEX_MAX_RETRY_DELAY)
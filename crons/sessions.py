@@ -0,0 +1,17 @@
+import asyncio
+
+import usecases
+from common.log import LogTypes, log
+
+# seconds without a poll after which a session is closed
+SESSION_IDLE_TIMEOUT = 300
+
+
+async def expire_idle_sessions() -> None:
+    while True:
+        await asyncio.sleep(30)
+
+        for session in usecases.bancho.get_idle_sessions(SESSION_IDLE_TIMEOUT):
+            log(f"Session of {session.username} expired, logging out", LogTypes.INFO)
+
+            await usecases.bancho.logout(session)
@@ -1,9 +1,13 @@
 import pprint
+import time
+from collections import Counter
 from enum import Enum
+from functools import cached_property
 from inspect import currentframe
 from typing import Any
 
-from common.log import LogTypes, log, logger, setup_logging
+from common.log import LogTypes, is_enabled, log
+from common.metrics import LabeledGauge
 
 
 class ServerErrorType(Enum):
@@ -14,8 +18,10 @@ class AdapterAPIError(ServerErrorType):
     LOGIN_FAILED = "LOGIN_FAILED"
     GET_PROFILE_FAILED = "GET_PROFILE_FAILED"
     GET_RANK_FAILED = "GET_RANK_FAILED"
+    GET_RANK_THRESHOLDS_FAILED = "GET_RANK_THRESHOLDS_FAILED"
     GET_SESSION_FAILED = "GET_SESSION_FAILED"
     LOGOUT_FAILED = "LOGOUT_FAILED"
+    BACKEND_UNAVAILABLE = "BACKEND_UNAVAILABLE"
 
 
 class ApplicationRepoError(ServerErrorType):
@@ -23,6 +29,34 @@ class ApplicationRepoError(ServerErrorType):
     CONFIG_API_FAILED = "CONFIG_API_FAILED"
 
 
+class BanchoError(ServerErrorType):
+    LOGIN_TIMED_OUT = "LOGIN_TIMED_OUT"
+
+
+class ProfilerError(ServerErrorType):
+    NO_PROFILE = "NO_PROFILE"
+
+
+# seconds between two logs of one error type, errors in between are only counted
+ERROR_LOG_INTERVAL = 10.0
+
+# every error raised, by type
+error_counts: Counter[ServerErrorType] = Counter()
+
+# errors not logged because of ERROR_LOG_INTERVAL, since the last log of their type
+suppressed_error_counts: Counter[ServerErrorType] = Counter()
+
+last_logged_at: dict[ServerErrorType, float] = {}
+
+LabeledGauge(
+    "server_errors_total",
+    "ServerErrors created, by error",
+    label="error",
+    collect=lambda: {str(error): count for error, count in error_counts.items()},
+    kind="counter",
+)
+
+
 class ServerError:
     def __init__(
         self,
@@ -47,6 +81,12 @@ class ServerError:
 
         self.status_code = status_code
 
+        # set once this instance went through print_error, logged or suppressed
+        self.reported = False
+
+        error_counts[error_name] += 1
+
+        # the captured variables are only formatted if this error gets logged
         if log_now:
             self.print_error(detailed=True)
 
@@ -83,7 +123,7 @@ class ServerError:
     def error_message(self) -> str:
         return f"{self.error_name} was raised at {self.file_location}:{self.line} with message: {self.message}"
 
-    @property
+    @cached_property
     def detailed_error_message(self) -> str:
         return (
             f"{self.error_name} was raised at {self.file_location}:{self.line} with message: {self.message}\n\n"
@@ -92,14 +132,41 @@ class ServerError:
             f"local_variables: {self.local_variables}"
         )
 
+    def should_log(self) -> bool:
+        now = time.monotonic()
+
+        last_logged = last_logged_at.get(self.error_name)
+        if last_logged is not None and now - last_logged < ERROR_LOG_INTERVAL:
+            suppressed_error_counts[self.error_name] += 1
+            return False
+
+        last_logged_at[self.error_name] = now
+        return True
+
     def print_error(self, detailed: bool = False) -> None:
-        global logger
-        if logger is None:
-            logger = setup_logging()
+        # one error is only counted and logged once, however often it's printed
+        if self.reported:
+            return
+
+        self.reported = True
+
+        # the detailed message formats every captured variable, skip it unlogged
+        if not is_enabled(LogTypes.ERROR):
+            return
+
+        # during an error storm only one error per type and interval is logged
+        if not self.should_log():
+            return
+
+        suppressed = suppressed_error_counts.pop(self.error_name, 0)
+        suppressed_message = (
+            f"\n\n{suppressed} more {self.error_name} errors were not logged"
+            if suppressed
+            else ""
+        )
 
+        # goes to the console and the log file alike
         if detailed:
-            log(self.detailed_error_message, LogTypes.ERROR)
-            logger.error(self.detailed_error_message)
+            log(self.detailed_error_message + suppressed_message, LogTypes.ERROR)
         else:
-            log(self.detailed_error_message, LogTypes.ERROR)
-            logger.error(self.error_message)
+            log(self.error_message + suppressed_message, LogTypes.ERROR)
@@ -1,20 +1,36 @@
 import asyncio
-from contextlib import asynccontextmanager
+from contextlib import asynccontextmanager, suppress
 
 import uvicorn
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from common.log import LogTypes, log, setup_logging
+from common.http import close_http_client, open_http_client
+from common.log import LogTypes, log, setup_logging, stop_logging
+from common.profiler import ProfilerMiddleware
 from controllers.application import application_router
-from controllers.bancho import bancho_router
-from crons.client import check_if_client_is_closed
+from controllers.bancho import BanchoASGIApp, bancho_router
+from crons.client import watch_client_exit
+from crons.config import refresh_config
+from crons.ranks import load_rank_index
+from crons.sessions import expire_idle_sessions
+
+
+# talk HTTP/2 to a backend served over https, needs the optional `h2` package
+HTTP2 = False
+
+# log everyone out once the osu! client exits,
+# turned off by the load test since its clients have no process behind them
+WATCH_CLIENT_EXIT = True
 
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     app.state.logger = setup_logging()
 
+    # one pooled client for every backend call, closed on shutdown
+    app.state.http_client = await open_http_client(http2=HTTP2)
+
     app.include_router(application_router)
 
     for prefix in ("c", "ce", "c4", "c5", "c6"):
@@ -26,12 +42,31 @@ async def lifespan(app: FastAPI):
     # TODO: Handle /b/*
     # TODO: Handle /osu/*
 
-    asyncio.create_task(check_if_client_is_closed())
+    background_tasks = [
+        asyncio.create_task(expire_idle_sessions()),
+        asyncio.create_task(load_rank_index()),
+        asyncio.create_task(refresh_config()),
+    ]
+
+    if WATCH_CLIENT_EXIT:
+        background_tasks.append(asyncio.create_task(watch_client_exit()))
 
     log("osu! Client Service Launched!", LogTypes.SUCCESS)
 
     yield
 
+    for task in background_tasks:
+        task.cancel()
+
+    for task in background_tasks:
+        with suppress(asyncio.CancelledError):
+            await task
+
+    await close_http_client()
+
+    log("osu! Client Service Stopped!", LogTypes.INFO)
+    stop_logging()
+
 
 app = FastAPI(lifespan=lifespan)
 
@@ -44,5 +79,15 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# serve osu! client polls from a raw ASGI app placed in front of FastAPI,
+# set to False to route them through FastAPI like every other request
+BANCHO_FAST_PATH = True
+
+server = BanchoASGIApp(app) if BANCHO_FAST_PATH else app
+
+# outermost, so profiled requests include the bancho fast path,
+# idle until started from /application/profiler/start
+server = ProfilerMiddleware(server)
+
 if __name__ == "__main__":
-    uvicorn.run("main:app", port=5001, reload=True)
+    uvicorn.run("main:server", port=5001, reload=True)
@@ -1,5 +1,6 @@
+import struct
 from dataclasses import dataclass
-from typing import TypedDict
+from typing import Iterator, TypedDict
 
 
 @dataclass
@@ -78,3 +79,121 @@ def login_data(raw_login_data: bytes) -> LoginInfo:
             adapters=adapters,
         ),
     )
+
+
+# packet id (u16), compression bool (pad byte) and data length (u32)
+PACKET_HEADER = struct.Struct("<HxI")
+
+I8 = struct.Struct("<b")
+U8 = struct.Struct("<B")
+I16 = struct.Struct("<h")
+U16 = struct.Struct("<H")
+I32 = struct.Struct("<i")
+U32 = struct.Struct("<I")
+I64 = struct.Struct("<q")
+F32 = struct.Struct("<f")
+
+
+def iter_packets(body: bytes | memoryview) -> Iterator[tuple[int, memoryview]]:
+    """Split a bancho request body into (packet id, payload) frames.
+
+    Payloads are views into `body`, nothing is copied.
+    A truncated trailing packet is dropped.
+    """
+
+    view = memoryview(body)
+    end = len(view)
+    offset = 0
+
+    while offset + PACKET_HEADER.size <= end:
+        packet_id, length = PACKET_HEADER.unpack_from(view, offset)
+        offset += PACKET_HEADER.size
+
+        if offset + length > end:
+            break
+
+        yield packet_id, view[offset : offset + length]
+
+        offset += length
+
+
+class PacketReader:
+    """Reads typed fields from a packet payload, front to back"""
+
+    __slots__ = ("view", "offset")
+
+    def __init__(self, data: bytes | memoryview) -> None:
+        self.view = memoryview(data)
+        self.offset = 0
+
+    def _unpack(self, codec: struct.Struct) -> int | float:
+        (value,) = codec.unpack_from(self.view, self.offset)
+        self.offset += codec.size
+        return value
+
+    def read_byte(self) -> int:
+        return self._unpack(I8)  # type: ignore
+
+    def read_unsigned_byte(self) -> int:
+        return self._unpack(U8)  # type: ignore
+
+    def read_short(self) -> int:
+        return self._unpack(I16)  # type: ignore
+
+    def read_unsigned_short(self) -> int:
+        return self._unpack(U16)  # type: ignore
+
+    def read_int(self) -> int:
+        return self._unpack(I32)  # type: ignore
+
+    def read_unsigned_int(self) -> int:
+        return self._unpack(U32)  # type: ignore
+
+    def read_long_long(self) -> int:
+        return self._unpack(I64)  # type: ignore
+
+    def read_float(self) -> float:
+        return self._unpack(F32)
+
+    def read_uleb128(self) -> int:
+        num = shift = 0
+
+        while True:
+            byte = self.view[self.offset]
+            self.offset += 1
+
+            num |= (byte & 0b01111111) << shift
+            if not byte & 0b10000000:
+                return num
+
+            shift += 7
+
+    def read_string(self) -> str:
+        # 0x00 means an empty string, 0x0b is followed by the length and the data
+        if self.view[self.offset] != 0x0B:
+            self.offset += 1
+            return ""
+
+        self.offset += 1
+        length = self.read_uleb128()
+
+        string = str(self.view[self.offset : self.offset + length], "utf-8")
+        self.offset += length
+
+        return string
+
+    def read_list32(self) -> list[int]:
+        length = self.read_short()
+
+        values = struct.unpack_from(f"<{length}i", self.view, self.offset)
+        self.offset += length * 4
+
+        return list(values)
+
+    def read_raw(self) -> memoryview:
+        """The rest of the payload, as a view"""
+
+        view = self.view[self.offset :]
+        self.offset = len(self.view)
+
+        return view
@@ -1,8 +1,11 @@
+import asyncio
 import struct
 from enum import IntEnum
-from typing import Any
+from time import perf_counter
+from typing import Any, Callable, Hashable, TypedDict
 
 from common.game_mode import GameMode
+from common.metrics import Counter, PacketCounter
 
 
 class ServerPacketIDS(IntEnum):
@@ -68,7 +71,82 @@ class ServerPacketIDS(IntEnum):
 
 
 class ClientPacketIDS(IntEnum):
-    ...
+    CHANGE_ACTION = 0
+    SEND_PUBLIC_MESSAGE = 1
+    LOGOUT = 2
+    REQUEST_STATUS_UPDATE = 3
+    PING = 4
+    START_SPECTATING = 16
+    STOP_SPECTATING = 17
+    SPECTATE_FRAMES = 18
+    ERROR_REPORT = 20
+    CANT_SPECTATE = 21
+    SEND_PRIVATE_MESSAGE = 25
+    PART_LOBBY = 29
+    JOIN_LOBBY = 30
+    CREATE_MATCH = 31
+    JOIN_MATCH = 32
+    PART_MATCH = 33
+    MATCH_CHANGE_SLOT = 38
+    MATCH_READY = 39
+    MATCH_LOCK = 40
+    MATCH_CHANGE_SETTINGS = 41
+    MATCH_START = 44
+    MATCH_SCORE_UPDATE = 47
+    MATCH_COMPLETE = 49
+    MATCH_CHANGE_MODS = 51
+    MATCH_LOAD_COMPLETE = 52
+    MATCH_NO_BEATMAP = 54
+    MATCH_NOT_READY = 55
+    MATCH_FAILED = 56
+    MATCH_HAS_BEATMAP = 59
+    MATCH_SKIP_REQUEST = 60
+    CHANNEL_JOIN = 63
+    BEATMAP_INFO_REQUEST = 68
+    MATCH_TRANSFER_HOST = 70
+    FRIEND_ADD = 73
+    FRIEND_REMOVE = 74
+    MATCH_CHANGE_TEAM = 77
+    CHANNEL_PART = 78
+    RECEIVE_UPDATES = 79
+    SET_AWAY_MESSAGE = 82
+    IRC_ONLY = 84
+    USER_STATS_REQUEST = 85
+    MATCH_INVITE = 87
+    MATCH_CHANGE_PASSWORD = 90
+    TOURNAMENT_MATCH_INFO_REQUEST = 93
+    USER_PRESENCE_REQUEST = 97
+    USER_PRESENCE_REQUEST_ALL = 98
+    TOGGLE_BLOCK_NON_FRIEND_DMS = 99
+    TOURNAMENT_JOIN_MATCH_CHANNEL = 108
+    TOURNAMENT_LEAVE_MATCH_CHANNEL = 109
+
+
+packets_encoded = PacketCounter(
+    "bancho_packets_encoded_total",
+    "Server packets written into replies",
+    ServerPacketIDS,
+)
+packet_bytes_encoded = PacketCounter(
+    "bancho_packet_bytes_encoded_total",
+    "Bytes of server packets written into replies",
+    ServerPacketIDS,
+)
+packet_encode_seconds = PacketCounter(
+    "bancho_packet_encode_seconds_total",
+    "Time spent writing server packets into replies",
+    ServerPacketIDS,
+)
+
+# pre-encoded blocks hold many packets, they are counted apart from the ids above
+encoded_blocks_written = Counter(
+    "bancho_encoded_blocks_written_total",
+    "Pre-encoded packet blocks written into replies",
+)
+encoded_block_bytes_written = Counter(
+    "bancho_encoded_block_bytes_written_total",
+    "Bytes of pre-encoded packet blocks written into replies",
+)
 
 
 class Action(IntEnum):
@@ -113,7 +191,177 @@ class LongLongInt(int):
     ...
 
 
+# packet id (u16), compression bool (pad byte) and data length (u32)
+PACKET_HEADER = struct.Struct("<HxI")
+
+# struct format characters for every fixed-width field type
+FIXED_WIDTH_FORMATS: dict[type, str] = {
+    UnsignedInt: "I",
+    Short: "h",
+    OsuByte: "b",
+    OsuUnsignedByte: "B",
+    LongLongInt: "q",
+    int: "i",
+    float: "f",
+}
+
+LIST_LENGTH = struct.Struct("<h")
+
+
+def write_uleb128_into(buffer: bytearray, num: int) -> None:
+    if num == 0:
+        buffer.append(0)
+        return
+
+    while num > 0:
+        byte = num & 0b01111111
+        num >>= 7
+        if num != 0:
+            byte |= 0b10000000
+        buffer.append(byte)
+
+
+def write_string_into(buffer: bytearray, string: str) -> None:
+    s = string.encode()
+    buffer.append(0x0B)
+    write_uleb128_into(buffer, len(s))
+    buffer += s
+
+
+def write_list32_into(buffer: bytearray, list_of_ints: list[int]) -> None:
+    buffer += LIST_LENGTH.pack(len(list_of_ints))
+    buffer += struct.pack(f"<{len(list_of_ints)}i", *list_of_ints)
+
+
+def string_size(string: str) -> int:
+    length = len(string) if string.isascii() else len(string.encode())
+    uleb128_length = max(1, (length.bit_length() + 6) // 7)
+
+    return 1 + uleb128_length + length
+
+
+def list32_size(list_of_ints: list[int]) -> int:
+    return LIST_LENGTH.size + 4 * len(list_of_ints)
+
+
+class PacketSchema:
+    """Field layout of a server packet, compiled once when the packet class is defined.
+
+    Consecutive fixed-width fields are merged into a single `struct.Struct`,
+    strings and int lists are written between those runs.
+    """
+
+    def __init__(self, fields: dict[str, type]) -> None:
+        self.fields = fields
+
+        # each segment is (struct, field names) for a fixed-width run
+        # or (writer, field name) for a variable-width field
+        self.segments: list[tuple[Any, Any]] = []
+
+        # encoded size is the fixed size plus the size of each variable-width field
+        self.fixed_size = PACKET_HEADER.size
+        self.variable_sizes: list[tuple[str, Callable[[Any], int]]] = []
+
+        run_format = ""
+        run_names: list[str] = []
+
+        for name, field_type in fields.items():
+            if field_type in FIXED_WIDTH_FORMATS:
+                field_format = FIXED_WIDTH_FORMATS[field_type]
+                run_format += field_format
+                run_names.append(name)
+                self.fixed_size += struct.calcsize(f"<{field_format}")
+                continue
+
+            if field_type is str:
+                writer = write_string_into
+                self.variable_sizes.append((name, string_size))
+            elif field_type is Listi32:
+                writer = write_list32_into
+                self.variable_sizes.append((name, list32_size))
+            else:
+                raise ValueError(f"Invalid type {field_type} for field {name}")
+
+            if run_names:
+                self.segments.append(
+                    (struct.Struct(f"<{run_format}"), tuple(run_names))
+                )
+                run_format, run_names = "", []
+
+            self.segments.append((writer, name))
+
+        # packets made only of fixed-width fields are packed in one go, header included
+        self.fixed: struct.Struct | None = None
+        self.fixed_names: tuple[str, ...] = ()
+
+        if not self.segments:
+            self.fixed = struct.Struct(f"{PACKET_HEADER.format}{run_format}")
+            self.fixed_names = tuple(run_names)
+        elif run_names:
+            self.segments.append((struct.Struct(f"<{run_format}"), tuple(run_names)))
+
+    def size(self, packet_data: dict[str, Any]) -> int:
+        """Encoded size of the packet, header included, without encoding it"""
+
+        size = self.fixed_size
+        for name, field_size in self.variable_sizes:
+            size += field_size(packet_data[name])
+
+        return size
+
+    def write_body(self, buffer: bytearray, packet_data: dict[str, Any]) -> None:
+        """Append the packet data (without header) to `buffer`"""
+
+        for codec, names in self.segments:
+            if isinstance(codec, struct.Struct):
+                buffer += codec.pack(*[packet_data[name] for name in names])
+            else:
+                codec(buffer, packet_data[names])
+
+    def write(
+        self, buffer: bytearray, packet_id: int, packet_data: dict[str, Any]
+    ) -> None:
+        """Append the whole packet to `buffer`, backpatching its length in place"""
+
+        if self.fixed is not None:
+            buffer += self.fixed.pack(
+                packet_id,
+                self.fixed.size - PACKET_HEADER.size,
+                *[packet_data[name] for name in self.fixed_names],
+            )
+            return
+
+        # reserve the header, it is filled in once the body length is known
+        header_offset = len(buffer)
+        buffer += bytes(PACKET_HEADER.size)
+
+        self.write_body(buffer, packet_data)
+
+        PACKET_HEADER.pack_into(
+            buffer,
+            header_offset,
+            packet_id,
+            len(buffer) - header_offset - PACKET_HEADER.size,
+        )
+
+    def encode(self, packet_id: int, packet_data: dict[str, Any]) -> bytes:
+        if self.fixed is not None:
+            return self.fixed.pack(
+                packet_id,
+                self.fixed.size - PACKET_HEADER.size,
+                *[packet_data[name] for name in self.fixed_names],
+            )
+
+        packet = bytearray()
+        self.write(packet, packet_id, packet_data)
+
+        return bytes(packet)
+
+
 class ServerPacket:
+    # subclasses declare their field layout once, ad-hoc packets fall back to type checks
+    schema: PacketSchema | None = None
+
     def __init__(
         self,
         packet_id: ServerPacketIDS,
@@ -173,7 +421,29 @@ class ServerPacket:
     def write_float(self, value: float) -> bytes:
         return struct.pack("<f", value)
 
+    def encoded_size(self) -> int:
+        if self.schema is not None:
+            return self.schema.size(self.packet_data)
+
+        return len(self.to_bancho_protocol())
+
+    def write_into(self, buffer: bytearray) -> None:
+        started_at = perf_counter()
+        start_size = len(buffer)
+
+        if self.schema is not None:
+            self.schema.write(buffer, self.packet_id, self.packet_data)
+        else:
+            buffer += self.to_bancho_protocol()
+
+        packets_encoded.inc(self.packet_id)
+        packet_bytes_encoded.inc(self.packet_id, len(buffer) - start_size)
+        packet_encode_seconds.inc(self.packet_id, perf_counter() - started_at)
+
     def to_bancho_protocol(self) -> bytes:
+        if self.schema is not None:
+            return self.schema.encode(self.packet_id, self.packet_data)
+
         # write packet id & compression bool
         packet = bytearray(struct.pack("<Hx", self.packet_id))
 
@@ -209,20 +479,22 @@ class ServerPacket:
 
 
 class UserIDPacket(ServerPacket):
+    # negative ids are login error codes, so this is written signed
+    schema = PacketSchema({"user_id": int})
+
     def __init__(
         self,
         user_id: int,
     ) -> None:
 
-        if user_id > 0:
-            user_id = UnsignedInt(user_id)
-
         super().__init__(
             packet_id=ServerPacketIDS.USER_ID, packet_data={"user_id": user_id}
         )
 
 
 class NotificationPacket(ServerPacket):
+    schema = PacketSchema({"message": str})
+
     def __init__(
         self,
         message: str,
@@ -234,6 +506,8 @@ class NotificationPacket(ServerPacket):
 
 
 class ProtocolVersionPacket(ServerPacket):
+    schema = PacketSchema({"version": int})
+
     def __init__(
         self,
     ) -> None:
@@ -244,6 +518,8 @@ class ProtocolVersionPacket(ServerPacket):
 
 
 class FriendsListPacket(ServerPacket):
+    schema = PacketSchema({"friends": Listi32})
+
     def __init__(
         self,
         friends: list[int],
@@ -252,14 +528,14 @@ class FriendsListPacket(ServerPacket):
 
         # TODO: Understand wether we need to send the whole user's friends list or just the online ones
 
-        friends = Listi32(friends)
-
         super().__init__(
             packet_id=ServerPacketIDS.FRIENDS_LIST, packet_data={"friends": friends}
         )
 
 
 class MainMenuIconPacket(ServerPacket):
+    schema = PacketSchema({"image_and_click_link": str})
+
     def __init__(
         self,
         image: str,
@@ -275,6 +551,14 @@ class MainMenuIconPacket(ServerPacket):
 
 
 class ChannelInfoPacket(ServerPacket):
+    schema = PacketSchema(
+        {
+            "channel_name": str,
+            "channel_description": str,
+            "channel_player_count": Short,
+        }
+    )
+
     def __init__(
         self,
         channel_name: str,
@@ -289,12 +573,14 @@ class ChannelInfoPacket(ServerPacket):
             packet_data={
                 "channel_name": channel_name,
                 "channel_description": channel_description,
-                "channel_player_count": Short(1),
+                "channel_player_count": 1,
             },
         )
 
 
 class BanchoPrivilegesPacket(ServerPacket):
+    schema = PacketSchema({"privileges": int})
+
     def __init__(
         self,
         privileges: int,
@@ -306,6 +592,8 @@ class BanchoPrivilegesPacket(ServerPacket):
 
 
 class ChannelInfoEndPacket(ServerPacket):
+    schema = PacketSchema({})
+
     def __init__(
         self,
     ) -> None:
@@ -314,6 +602,8 @@ class ChannelInfoEndPacket(ServerPacket):
 
 
 class ChannelJoinPacket(ServerPacket):
+    schema = PacketSchema({"channel_name": str})
+
     def __init__(
         self,
         channel_name: str,
@@ -328,7 +618,40 @@ class ChannelJoinPacket(ServerPacket):
         )
 
 
+class RestartPacket(ServerPacket):
+    schema = PacketSchema({"milliseconds": int})
+
+    def __init__(
+        self,
+        milliseconds: int,
+    ) -> None:
+        """milliseconds: how long the client waits before reconnecting"""
+
+        super().__init__(
+            packet_id=ServerPacketIDS.RESTART,
+            packet_data={"milliseconds": milliseconds},
+        )
+
+
 class UserStatsPacket(ServerPacket):
+    schema = PacketSchema(
+        {
+            "user_id": int,
+            "action": OsuByte,
+            "info_text": str,
+            "map_md5": str,
+            "mods": int,
+            "mode": OsuUnsignedByte,
+            "map_id": int,
+            "ranked_score": LongLongInt,
+            "accuracy": float,
+            "playcount": int,
+            "total_score": LongLongInt,
+            "rank": int,
+            "pp": Short,
+        }
+    )
+
     def __init__(
         self,
         user_id: int,
@@ -346,37 +669,43 @@ class UserStatsPacket(ServerPacket):
         pp: int,
     ) -> None:
 
-        # TODO: is the type checker correct?
-        action = OsuByte(action.value)  # type: ignore
-        game_mode = OsuUnsignedByte(game_mode.value)  # type: ignore
-
-        ranked_score = LongLongInt(ranked_score)
-        total_score = LongLongInt(total_score)
-        pp = Short(pp)
-
         accuracy = accuracy / 100.0
 
+        # the schema packs these with integer formats, the backend may send floats
         super().__init__(
             packet_id=ServerPacketIDS.USER_STATS,
             packet_data={
                 "user_id": user_id,
-                "action": action,
+                "action": int(action.value),
                 "info_text": info_text,
                 "map_md5": current_map_md5,
                 "mods": current_mods_enabled,
-                "mode": game_mode,
+                "mode": int(game_mode.value),
                 "map_id": current_map_id,
-                "ranked_score": ranked_score,
+                "ranked_score": int(ranked_score),
                 "accuracy": accuracy,
                 "playcount": play_count,
-                "total_score": total_score,
+                "total_score": int(total_score),
                 "rank": rank,
-                "pp": pp,
+                "pp": int(pp),
             },
         )
 
 
 class UserPresencePacket(ServerPacket):
+    schema = PacketSchema(
+        {
+            "user_id": int,
+            "username": str,
+            "utc_offset": OsuUnsignedByte,
+            "country_code": OsuUnsignedByte,
+            "bancho_privliges_and_game_mode": OsuUnsignedByte,
+            "longitude": float,
+            "latitude": float,
+            "rank": int,
+        }
+    )
+
     def __init__(
         self,
         user_id: int,
@@ -390,19 +719,15 @@ class UserPresencePacket(ServerPacket):
         rank: int,
     ) -> None:
 
-        bancho_privliges_and_game_mode = OsuUnsignedByte(
-            bancho_privliges | game_mode.value << 5
-        )
-        utc_offset = OsuUnsignedByte(utc_offset + 24)
-        country_code = OsuUnsignedByte(country_code)
+        bancho_privliges_and_game_mode = int(bancho_privliges | game_mode.value << 5)
 
         super().__init__(
             packet_id=ServerPacketIDS.USER_PRESENCE_SINGLE,
             packet_data={
                 "user_id": user_id,
                 "username": username,
-                "utc_offset": utc_offset,
-                "country_code": country_code,
+                "utc_offset": int(utc_offset + 24),
+                "country_code": int(country_code),
                 "bancho_privliges_and_game_mode": bancho_privliges_and_game_mode,
                 "longitude": longitude,
                 "latitude": latitude,
@@ -411,6 +736,228 @@ class UserPresencePacket(ServerPacket):
         )
 
 
+class EncodedPackets(ServerPacket):
+    """One or more packets that are already in bancho protocol form"""
+
+    def __init__(
+        self,
+        raw_packets: bytes,
+    ) -> None:
+
+        # the id of the first packet, the rest are opaque
+        packet_id, _ = PACKET_HEADER.unpack_from(raw_packets)
+
+        super().__init__(packet_id=ServerPacketIDS(packet_id))
+
+        self.raw_packets = raw_packets
+
+    def to_bancho_protocol(self) -> bytes:
+        return self.raw_packets
+
+    def write_into(self, buffer: bytearray) -> None:
+        buffer += self.raw_packets
+
+        encoded_blocks_written.inc()
+        encoded_block_bytes_written.inc(len(self.raw_packets))
+
+
+class PacketWriter:
+    """Writes many packets one after another into a single buffer"""
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def write(self, packet: ServerPacket) -> None:
+        packet.write_into(self.buffer)
+
+    def write_many(self, packets: list[ServerPacket]) -> None:
+        for packet in packets:
+            packet.write_into(self.buffer)
+
+    def write_raw(self, raw_packets: bytes) -> None:
+        self.buffer += raw_packets
+
+    def getvalue(self) -> memoryview:
+        """View over everything written so far, no copy is made"""
+        return memoryview(self.buffer)
+
+
+# packets where only the latest one per user matters
+COALESCED_PACKET_IDS = {
+    ServerPacketIDS.USER_STATS,
+    ServerPacketIDS.USER_PRESENCE,
+    ServerPacketIDS.USER_PRESENCE_SINGLE,
+}
+
+# bytes a queue may hold before producers have to wait for a drain
+MAX_PACKET_QUEUE_SIZE = 1024 * 1024
+
+
+class PacketQueue:
+    """Outbound packets of a session, waiting for its next poll.
+
+    Stats and presence packets are coalesced per (packet id, user id):
+    a newer packet replaces the queued one at its original position.
+    """
+
+    def __init__(self, max_size: int = MAX_PACKET_QUEUE_SIZE) -> None:
+        # insertion ordered, replacing a key keeps its position
+        self.packets: dict[Hashable, tuple[ServerPacket, int]] = {}
+        self.size = 0
+        self.max_size = max_size
+
+        self.next_key = 0
+
+        self.has_space = asyncio.Event()
+        self.has_space.set()
+
+        # set while anything is queued, long polls wait on it
+        self.has_packets = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self.packets)
+
+    @property
+    def full(self) -> bool:
+        return self.size >= self.max_size
+
+    def push(self, packet: ServerPacket) -> bool:
+        """Queue a packet, returns False if the queue is full and it was dropped"""
+
+        key: Hashable
+        if packet.packet_id in COALESCED_PACKET_IDS:
+            key = (packet.packet_id, packet.packet_data["user_id"])
+        else:
+            key = self.next_key
+            self.next_key += 1
+
+        previous = self.packets.get(key)
+
+        # replacing a queued packet is always allowed, it barely changes the size
+        if previous is None and self.full:
+            self.has_space.clear()
+            return False
+
+        packet_size = packet.encoded_size()
+
+        if previous is not None:
+            self.size -= previous[1]
+
+        self.packets[key] = (packet, packet_size)
+        self.size += packet_size
+
+        self.has_packets.set()
+
+        if self.full:
+            self.has_space.clear()
+
+        return True
+
+    async def put(self, packet: ServerPacket) -> None:
+        """Queue a packet, waiting for the next drain while the queue is full"""
+
+        while not self.push(packet):
+            await self.has_space.wait()
+
+    def drain_into(self, packet_writer: PacketWriter) -> None:
+        for packet, _ in self.packets.values():
+            packet.write_into(packet_writer.buffer)
+
+        self.packets.clear()
+        self.size = 0
+
+        self.has_packets.clear()
+        self.has_space.set()
+
+
+class MainMenuIcon(TypedDict):
+    image: str
+    click_link: str
+
+
+class Channel(TypedDict):
+    name: str
+    description: str
+
+
+MAIN_MENU_ICON = MainMenuIcon(
+    image="https://cdn.discordapp.com/attachments/1253210219127767084/1259387437831028787/174163885.png?ex=668b7f73&is=668a2df3&hm=223a310e98a6c4aba87646a22aa18a7ff5b84ef6e3725952be368bac7c3028b5&.png",
+    click_link="https://github.com/Local-osu-Server",
+)
+
+# TODO: Store Channel Info in the database
+# For now we can just send the default channels
+DEFAULT_CHANNELS: list[Channel] = [
+    Channel(name="osu", description="x"),
+    Channel(name="recent_scores", description="Shows recently submitted scores"),
+    Channel(
+        name="recent_top_scores", description="Shows recently submitted top scores"
+    ),
+]
+
+# bytes of every login packet that does not depend on the user,
+# built on first login and rebuilt only after the icon or channels change
+constant_login_packets: bytes | None = None
+
+
+def get_constant_login_packets() -> bytes:
+    global constant_login_packets
+
+    if constant_login_packets is None:
+        packets: list[ServerPacket] = [
+            NotificationPacket(message="Succesfully Logged into Local osu! Server!"),
+            ProtocolVersionPacket(),
+            BanchoPrivilegesPacket(
+                privileges=63  # Constant, all privileges to the user
+            ),
+            FriendsListPacket(friends=[]),
+            MainMenuIconPacket(
+                image=MAIN_MENU_ICON["image"],
+                click_link=MAIN_MENU_ICON["click_link"],
+            ),
+        ]
+
+        for channel in DEFAULT_CHANNELS:
+            packets.append(
+                ChannelInfoPacket(
+                    channel_name=channel["name"],
+                    channel_description=channel["description"],
+                )
+            )
+
+        packets.append(ChannelInfoEndPacket())
+
+        for channel in DEFAULT_CHANNELS:
+            packets.append(ChannelJoinPacket(channel_name=channel["name"]))
+
+        constant_login_packets = b"".join(
+            [packet.to_bancho_protocol() for packet in packets]
+        )
+
+    return constant_login_packets
+
+
+def invalidate_constant_login_packets() -> None:
+    global constant_login_packets
+    constant_login_packets = None
+
+
+def set_main_menu_icon(image: str, click_link: str) -> None:
+    MAIN_MENU_ICON["image"] = image
+    MAIN_MENU_ICON["click_link"] = click_link
+
+    invalidate_constant_login_packets()
+
+
+def set_default_channels(channels: list[Channel]) -> None:
+    DEFAULT_CHANNELS[:] = channels
+
+    invalidate_constant_login_packets()
+
+
 def login_error_response(error_message: str) -> list[ServerPacket]:
     return [
         UserIDPacket(user_id=-1),  # -1 is an error code
@@ -443,52 +990,8 @@ def login_response(
 
     user_id_packet = UserIDPacket(user_id=user_id)
 
-    notifcation_packet = NotificationPacket(
-        message="Succesfully Logged into Local osu! Server!"
-    )
-
-    protocol_version_packet = ProtocolVersionPacket()
-
-    bancho_privileges_packet = BanchoPrivilegesPacket(
-        privileges=63  # Constant, all privileges to the user
-    )
-
-    friends_list_packet = FriendsListPacket(friends=[])
-
-    main_menu_icon_packet = MainMenuIconPacket(
-        image="https://cdn.discordapp.com/attachments/1253210219127767084/1259387437831028787/174163885.png?ex=668b7f73&is=668a2df3&hm=223a310e98a6c4aba87646a22aa18a7ff5b84ef6e3725952be368bac7c3028b5&.png",
-        click_link="https://github.com/Local-osu-Server",
-    )
-
-    # TODO: Store Channel Info in the database
-    # For now we can just send the default channels
-
-    osu_channel_packet = ChannelInfoPacket(
-        channel_name="osu",
-        channel_description="x",
-    )
-
-    recent_scores_channel_packet = ChannelInfoPacket(
-        channel_name="recent_scores",
-        channel_description="Shows recently submitted scores",
-    )
-
-    recent_top_scores_channel_packet = ChannelInfoPacket(
-        channel_name="recent_top_scores",
-        channel_description="Shows recently submitted top scores",
-    )
-
-    channel_info_end_packet = ChannelInfoEndPacket()
-
-    joined_osu_channel_packet = ChannelJoinPacket(channel_name="osu")
-
-    joined_recent_scores_channel_packet = ChannelJoinPacket(
-        channel_name="recent_scores"
-    )
-
-    joined_recent_top_scores_channel_packet = ChannelJoinPacket(
-        channel_name="recent_top_scores"
-    )
+    # notification up to the channel joins never change between logins
+    constant_packets = EncodedPackets(raw_packets=get_constant_login_packets())
 
     user_stats_packet = UserStatsPacket(
         user_id=user_id,
@@ -520,18 +1023,7 @@ def login_response(
 
     return [
         user_id_packet,
-        notifcation_packet,
-        protocol_version_packet,
-        bancho_privileges_packet,
-        friends_list_packet,
-        main_menu_icon_packet,
-        osu_channel_packet,
-        recent_scores_channel_packet,
-        recent_top_scores_channel_packet,
-        channel_info_end_packet,
-        joined_osu_channel_packet,
-        joined_recent_scores_channel_packet,
-        joined_recent_top_scores_channel_packet,
+        constant_packets,
         user_stats_packet,
         user_precense_packet,
     ]
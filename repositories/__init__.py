@@ -1 +1 @@
-from . import application
+from . import application, config, ranks, sessions
@@ -1,49 +1,152 @@
+import asyncio
 import os
 from pathlib import Path
-from typing import TypedDict
+from time import perf_counter
 
 import psutil
-from httpx import AsyncClient
 
+from common.metrics import FAST_LATENCY_BUCKETS, LabeledHistogram
 from errors import ApplicationRepoError, ServerError
+from repositories.config import ConfigJSON, config_provider
 
 
-class ConfigJSON(TypedDict):
-    osu_folder_path: str
-    display_pp_on_leaderboard: bool
-    rank_scores_by_pp_or_score: bool
-    num_scores_seen_on_leaderboards: int
-    allow_pp_from_modified_maps: bool
-    osu_api_key: str | None
-    osu_daily_api_key: str
-    osu_api_v2_client_id: int
-    osu_api_v2_client_secret: str
-    osu_username: str | None
-    osu_password: str | None
-    dedicated_dev_server_domain: str
+OSU_PROCESS_NAME = "osu!.exe"
 
+# "check": the tracked pid is still osu!, "scan": every process was looked at
+process_scan_seconds = LabeledHistogram(
+    "osu_process_scan_seconds",
+    "Time spent looking for the osu! process",
+    label="kind",
+    buckets=FAST_LATENCY_BUCKETS,
+)
+
+
+class OsuProcessTracker:
+    """Remembers the osu! process once found, so later checks only look at its pid"""
 
-class ApplicationRepo:
     def __init__(self) -> None:
-        self.http_client = AsyncClient()
+        self.process: psutil.Process | None = None
+        self.path: Path | None = None
+
+    def forget(self) -> None:
+        self.process = None
+        self.path = None
+
+    def get_process(self) -> psutil.Process | None:
+        if self.process is not None:
+            started_at = perf_counter()
+
+            # also false if the pid was reused by another process
+            is_running = self.process.is_running()
+
+            process_scan_seconds.observe("check", perf_counter() - started_at)
+
+            if is_running:
+                return self.process
+
+            self.forget()
+
+        started_at = perf_counter()
+
+        self.process = self.scan()
+
+        process_scan_seconds.observe("scan", perf_counter() - started_at)
+
+        return self.process
+
+    @staticmethod
+    def scan() -> psutil.Process | None:
+        # only the name is fetched for every process on the machine
+        for process in psutil.process_iter(["name"]):
+            if process.info["name"] == OSU_PROCESS_NAME:
+                return process
+
+        return None
+
+    def is_running(self) -> bool:
+        return self.get_process() is not None
+
+    def get_path(self) -> Path | None:
+        process = self.get_process()
+        if process is None:
+            return None
+
+        if self.path is None:
+            try:
+                self.path = Path(process.cwd())
+            except psutil.NoSuchProcess:
+                self.forget()
+                return None
 
+        return self.path
+
+    async def wait_for_exit(self) -> None:
+        """Wait until the tracked osu! process exits, returns at once if none is running"""
+
+        process = self.get_process()
+        if process is None:
+            return
+
+        # linux: the pidfd becomes readable once the process exits
+        if hasattr(os, "pidfd_open"):
+            try:
+                pidfd = os.pidfd_open(process.pid)
+            except ProcessLookupError:
+                return
+            except OSError:
+                pass  # e.g. an older kernel, wait from a thread instead
+            else:
+                try:
+                    await self._wait_for_pidfd(pidfd)
+                finally:
+                    os.close(pidfd)
+
+                return
+
+        # short waits, so cancelling never leaves a thread blocked for long
+        while True:
+            try:
+                await asyncio.to_thread(process.wait, 1)
+                return
+            except psutil.TimeoutExpired:
+                continue
+            except psutil.NoSuchProcess:
+                return
+
+    @staticmethod
+    async def _wait_for_pidfd(pidfd: int) -> None:
+        loop = asyncio.get_running_loop()
+        exited = loop.create_future()
+
+        loop.add_reader(pidfd, lambda: exited.done() or exited.set_result(None))
+
+        try:
+            await exited
+        finally:
+            loop.remove_reader(pidfd)
+
+
+osu_process_tracker = OsuProcessTracker()
+
+
+class ApplicationRepo:
     def is_client_running(self) -> bool:
         """Check if osu! client is running"""
 
-        for process in psutil.process_iter():
-            if process.name() == "osu!.exe":
-                return True
+        return osu_process_tracker.is_running()
+
+    async def wait_for_client_exit(self) -> None:
+        """Wait until osu! client exits"""
 
-        return False
+        await osu_process_tracker.wait_for_exit()
 
     def get_osu_folder_path(self) -> dict[str, str] | ServerError:
         """Get osu! folder path"""
 
-        for process in psutil.process_iter():
-            if process.name() == "osu!.exe":
-                osu_path = Path(process.cwd())
+        osu_path = osu_process_tracker.get_path()
 
-                return {"message": "osu!.exe found.", "path": str(osu_path)}
+        if osu_path is not None:
+            return {"message": "osu!.exe found.", "path": str(osu_path)}
 
         # if the process is not found, return None
         return ServerError(
@@ -59,11 +162,17 @@ class ApplicationRepo:
     def kill_osu(self) -> dict[str, str] | ServerError:
         """Kill osu! process"""
 
-        for process in psutil.process_iter():
-            if process.name() == "osu!.exe":
+        process = osu_process_tracker.get_process()
+
+        if process is not None:
+            try:
                 process.kill()
+            except psutil.NoSuchProcess:
+                pass  # exited on its own meanwhile
+
+            osu_process_tracker.forget()
 
-                return {"message": "osu!.exe killed."}
+            return {"message": "osu!.exe killed."}
 
         return ServerError(
             error_name=ApplicationRepoError.OSU_NOT_FOUND,
@@ -75,22 +184,14 @@ class ApplicationRepo:
             in_scope_variables=dir(),
         )
 
+    async def get_config(self) -> ConfigJSON | ServerError:
+        return await config_provider.get()
+
     async def launch_osu(self) -> dict[str, str] | ServerError:
-        # TODO: make adaparter for this
-        response = await self.http_client.get("http://localhost:5000/api/v1/config/")
-
-        if response.status_code >= 400:
-            return ServerError(
-                error_name=ApplicationRepoError.CONFIG_API_FAILED,
-                message="Error while getting osu! folder path.",
-                file_location=__file__,
-                line=ServerError.get_current_line(),
-                status_code=500,
-                local_variables=locals(),
-                in_scope_variables=dir(),
-            )
-
-        config: ConfigJSON = response.json()
+        config = await self.get_config()
+
+        if isinstance(config, ServerError):
+            return config
 
         osu_client = Path(config["osu_folder_path"]) / "osu!.exe"
 
@@ -0,0 +1,126 @@
+import time
+from typing import Callable, TypedDict
+
+from httpx import Timeout, TransportError
+
+from common import fast_json
+from common.http import get_http_client
+from common.single_flight import SingleFlight
+from errors import ApplicationRepoError, ServerError
+
+CONFIG_URL = "http://localhost:5000/api/v1/config/"
+
+CONFIG_TIMEOUT = Timeout(3.0, connect=1.0)
+
+
+class ConfigJSON(TypedDict):
+    osu_folder_path: str
+    display_pp_on_leaderboard: bool
+    rank_scores_by_pp_or_score: bool
+    num_scores_seen_on_leaderboards: int
+    allow_pp_from_modified_maps: bool
+    osu_api_key: str | None
+    osu_daily_api_key: str
+    osu_api_v2_client_id: int
+    osu_api_v2_client_secret: str
+    osu_username: str | None
+    osu_password: str | None
+    dedicated_dev_server_domain: str
+
+
+class ConfigProvider:
+    """Keeps the launcher config in memory and revalidates it against the api.
+
+    Revalidation sends the last ETag, so an unchanged config costs a 304.
+    Subscribers are called with the new config whenever it changes.
+    While the api fails, unreachable or with an error reply alike, the last
+    known config keeps being served.
+    """
+
+    def __init__(self, max_age: float = 30.0) -> None:
+        self.max_age = max_age
+
+        self.config: ConfigJSON | None = None
+        self.etag: str | None = None
+        self.fetched_at = 0.0
+
+        self.subscribers: list[Callable[[ConfigJSON], None]] = []
+
+        # concurrent refreshes share one request
+        self.requests: SingleFlight[ConfigJSON | ServerError] = SingleFlight()
+
+    def subscribe(self, callback: Callable[[ConfigJSON], None]) -> None:
+        self.subscribers.append(callback)
+
+    async def get(self) -> ConfigJSON | ServerError:
+        """The cached config, revalidated first once it is older than `max_age`"""
+
+        if (
+            self.config is not None
+            and time.monotonic() - self.fetched_at < self.max_age
+        ):
+            return self.config
+
+        return await self.refresh()
+
+    async def refresh(self) -> ConfigJSON | ServerError:
+        return await self.requests.run("config", self.fetch)
+
+    async def fetch(self) -> ConfigJSON | ServerError:
+        headers = {"If-None-Match": self.etag} if self.etag is not None else {}
+
+        # TODO: make adaparter for this
+        try:
+            response = await get_http_client().get(
+                CONFIG_URL, headers=headers, timeout=CONFIG_TIMEOUT
+            )
+        except TransportError as exc:
+            # keep serving the last known config while the api is unreachable
+            if self.config is not None:
+                return self.config
+
+            return ServerError(
+                error_name=ApplicationRepoError.CONFIG_API_FAILED,
+                message=f"Could not reach the config api: {exc!r}",
+                file_location=__file__,
+                line=ServerError.get_current_line(),
+                status_code=503,
+                local_variables=locals(),
+                in_scope_variables=dir(),
+            )
+
+        if response.status_code == 304 and self.config is not None:
+            self.fetched_at = time.monotonic()
+            return self.config
+
+        if response.status_code >= 400:
+            # same as an unreachable api, the last known config still works
+            if self.config is not None:
+                return self.config
+
+            return ServerError(
+                error_name=ApplicationRepoError.CONFIG_API_FAILED,
+                message="Error while getting osu! folder path.",
+                file_location=__file__,
+                line=ServerError.get_current_line(),
+                status_code=500,
+                local_variables=locals(),
+                in_scope_variables=dir(),
+            )
+
+        config: ConfigJSON = fast_json.loads(response.content)
+
+        changed = config != self.config
+
+        self.config = config
+        self.etag = response.headers.get("etag")
+        self.fetched_at = time.monotonic()
+
+        if changed:
+            for callback in self.subscribers:
+                callback(config)
+
+        return config
+
+
+config_provider = ConfigProvider()
@@ -0,0 +1,53 @@
+from array import array
+from bisect import bisect_right
+
+
+class RankIndex:
+    """pp to rank lookups against known (pp, rank) thresholds, kept sorted by pp"""
+
+    def __init__(self) -> None:
+        self.pp = array("d")
+        self.ranks = array("q")
+
+        # until a bulk load, only single (pp, rank) pairs are known
+        # and values in between them can't be interpolated
+        self.loaded = False
+
+    def __len__(self) -> int:
+        return len(self.pp)
+
+    def load(self, thresholds: list[tuple[float, int]]) -> None:
+        """Replace the index with a bulk set of (pp, rank) thresholds"""
+
+        thresholds = sorted(thresholds)
+
+        self.pp = array("d", [pp for pp, _ in thresholds])
+        self.ranks = array("q", [rank for _, rank in thresholds])
+
+        self.loaded = True
+
+    def add(self, pp: float, rank: int) -> None:
+        index = bisect_right(self.pp, pp)
+
+        # same pp already known, just refresh its rank
+        if index > 0 and self.pp[index - 1] == pp:
+            self.ranks[index - 1] = rank
+            return
+
+        self.pp.insert(index, pp)
+        self.ranks.insert(index, rank)
+
+    def lookup(self, pp: float) -> int | None:
+        """Rank of the highest threshold at or below `pp`, None if it isn't known"""
+
+        index = bisect_right(self.pp, pp)
+        if index == 0:
+            return None
+
+        if not self.loaded and self.pp[index - 1] != pp:
+            return None
+
+        return self.ranks[index - 1]
+
+
+rank_index = RankIndex()
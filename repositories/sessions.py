@@ -0,0 +1,113 @@
+import asyncio
+import time
+
+from common.metrics import Gauge
+from packets.writing import PacketQueue
+
+
+class Session:
+    __slots__ = ("osu_token", "user_id", "username", "packet_queue", "last_active")
+
+    def __init__(self, osu_token: str, user_id: int, username: str) -> None:
+        self.osu_token = osu_token
+        self.user_id = user_id
+        self.username = username
+
+        # packets waiting to be sent on the session's next poll
+        self.packet_queue = PacketQueue()
+
+        self.last_active = time.monotonic()
+
+    def touch(self) -> None:
+        self.last_active = time.monotonic()
+
+
+class SessionRepo:
+    """In-process table of logged in clients, by osu-token and by user id.
+
+    One user can have several sessions, e.g. tournament spectator clients.
+    """
+
+    def __init__(self) -> None:
+        self.by_token: dict[str, Session] = {}
+        self.by_user_id: dict[int, list[Session]] = {}
+
+        # set while at least one session exists
+        self.has_sessions = asyncio.Event()
+
+    def __len__(self) -> int:
+        return len(self.by_token)
+
+    def create(self, osu_token: str, user_id: int, username: str) -> Session:
+        """Create a session, replacing any session with the same token"""
+
+        existing = self.by_token.get(osu_token)
+        if existing is not None:
+            self.remove(existing)
+
+        session = Session(osu_token=osu_token, user_id=user_id, username=username)
+
+        self.by_token[osu_token] = session
+        self.by_user_id.setdefault(user_id, []).append(session)
+
+        self.has_sessions.set()
+
+        return session
+
+    def get(self, osu_token: str) -> Session | None:
+        return self.by_token.get(osu_token)
+
+    def get_by_user_id(self, user_id: int) -> list[Session]:
+        return self.by_user_id.get(user_id, [])
+
+    def has_user(self, user_id: int) -> bool:
+        """Whether any client of the user is logged in.
+
+        The user stays logged in server side as long as this holds.
+        """
+
+        return user_id in self.by_user_id
+
+    def all(self) -> list[Session]:
+        return list(self.by_token.values())
+
+    def remove(self, session: Session) -> None:
+        if self.by_token.pop(session.osu_token, None) is None:
+            return
+
+        user_sessions = self.by_user_id[session.user_id]
+        user_sessions.remove(session)
+
+        if not user_sessions:
+            del self.by_user_id[session.user_id]
+
+        if not self.by_token:
+            self.has_sessions.clear()
+
+    def user_count(self) -> int:
+        return len(self.by_user_id)
+
+    def queued_packet_count(self) -> int:
+        return sum(len(session.packet_queue) for session in self.by_token.values())
+
+    def idle(self, max_idle: float) -> list[Session]:
+        """Sessions that haven't polled for `max_idle` seconds"""
+
+        cutoff = time.monotonic() - max_idle
+
+        return [
+            session
+            for session in self.by_token.values()
+            if session.last_active < cutoff
+        ]
+
+
+session_repo = SessionRepo()
+
+Gauge("bancho_sessions", "Logged in clients", session_repo.__len__)
+Gauge("bancho_users", "Users with at least one session", session_repo.user_count)
+Gauge(
+    "bancho_queued_packets",
+    "Packets waiting for the next poll, over every session",
+    session_repo.queued_packet_count,
+)
@@ -0,0 +1,300 @@
+"""Micro-benchmarks for the packet layer.
+
+    python -m tools.benchmark --output before.json
+    python -m tools.benchmark --compare before.json --threshold 0.1
+
+Times the encoding of every server packet class and of the whole login
+response, uleb128 and string writing over a range of lengths, login body
+parsing and the client packet decoder. Each result is the best of several
+runs, in nanoseconds per call.
+
+--compare exits with 1 if any benchmark got slower than the baseline by
+more than --threshold, --against compares two saved files without running.
+"""
+
+import argparse
+import json
+import platform
+import sys
+import timeit
+from pathlib import Path
+from typing import Callable
+
+import packets.reading as packet_reading
+import packets.writing as packet_writing
+from common.game_mode import GameMode
+from packets.reading import PACKET_HEADER, PacketReader
+from packets.writing import Action, ClientPacketIDS, ServerPacket
+
+# timing runs per benchmark, the fastest one counts
+REPEAT = 7
+
+# seconds each timing run should take, roughly
+RUN_TIME = 0.1
+
+# string lengths around the uleb128 length prefix boundaries
+STRING_LENGTHS = (0, 1, 16, 127, 128, 1024, 16383, 16384)
+
+Benchmarks = dict[str, Callable[[], object]]
+
+
+def server_packets() -> list[ServerPacket]:
+    """One instance of every server packet class, with realistic values"""
+
+    return [
+        packet_writing.UserIDPacket(user_id=1000),
+        packet_writing.NotificationPacket(message="Welcome to the local osu! server"),
+        packet_writing.ProtocolVersionPacket(),
+        packet_writing.FriendsListPacket(friends=list(range(1000, 1050))),
+        packet_writing.MainMenuIconPacket(
+            image="https://example.com/menu-icon.png",
+            click_link="https://example.com",
+        ),
+        packet_writing.ChannelInfoPacket(
+            channel_name="#osu", channel_description="General discussion"
+        ),
+        packet_writing.BanchoPrivilegesPacket(privileges=1),
+        packet_writing.ChannelInfoEndPacket(),
+        packet_writing.ChannelJoinPacket(channel_name="#osu"),
+        packet_writing.RestartPacket(milliseconds=0),
+        packet_writing.UserStatsPacket(
+            user_id=1000,
+            action=Action.Playing,
+            info_text="Artist - Title [Insane]",
+            current_map_md5="0123456789abcdef0123456789abcdef",
+            current_mods_enabled=72,
+            game_mode=GameMode.STANDARD,
+            current_map_id=123456,
+            ranked_score=123_456_789,
+            accuracy=98.76,
+            play_count=4321,
+            total_score=987_654_321,
+            rank=12345,
+            pp=4567,
+        ),
+        packet_writing.UserPresencePacket(
+            user_id=1000,
+            username="player",
+            utc_offset=2,
+            country_code=0,
+            bancho_privliges=1,
+            game_mode=GameMode.STANDARD,
+            longitude=0.0,
+            latitude=0.0,
+            rank=12345,
+        ),
+        packet_writing.EncodedPackets(
+            raw_packets=packet_writing.get_constant_login_packets()
+        ),
+    ]
+
+
+def login_body() -> bytes:
+    client_hashes = "a" * 32 + ":runningunderwine.:" + ":".join(["b" * 32] * 3) + ":"
+
+    return f"player\n{'c' * 32}\nb20240123|2|1|{client_hashes}|0\n".encode()
+
+
+def poll_body() -> bytes:
+    """A busy poll: a status change, a chat message and a ping"""
+
+    def string(value: str) -> bytes:
+        buffer = bytearray()
+        packet_writing.write_string_into(buffer, value)
+        return bytes(buffer)
+
+    change_action = (
+        bytes([Action.Playing])
+        + string("Artist - Title [Insane]")
+        + string("0123456789abcdef0123456789abcdef")
+        + (72).to_bytes(4, "little")
+        + bytes([GameMode.STANDARD.value])
+        + (123456).to_bytes(4, "little")
+    )
+    public_message = string("") + string("hello everyone!") + string("#osu") + bytes(4)
+
+    body = bytearray()
+    for packet_id, payload in (
+        (ClientPacketIDS.CHANGE_ACTION, change_action),
+        (ClientPacketIDS.SEND_PUBLIC_MESSAGE, public_message),
+        (ClientPacketIDS.PING, b""),
+    ):
+        body += PACKET_HEADER.pack(packet_id, len(payload)) + payload
+
+    return bytes(body)
+
+
+def decode_poll(body: bytes) -> None:
+    for packet_id, data in packet_reading.iter_packets(body):
+        reader = PacketReader(data)
+
+        if packet_id == ClientPacketIDS.CHANGE_ACTION:
+            reader.read_unsigned_byte()
+            reader.read_string()
+            reader.read_string()
+            reader.read_unsigned_int()
+            reader.read_unsigned_byte()
+            reader.read_int()
+        elif packet_id == ClientPacketIDS.SEND_PUBLIC_MESSAGE:
+            reader.read_string()
+            reader.read_string()
+            reader.read_string()
+            reader.read_int()
+
+
+def collect_benchmarks() -> Benchmarks:
+    benchmarks: Benchmarks = {}
+
+    for packet in server_packets():
+        name = f"to_bancho_protocol[{type(packet).__name__}]"
+        benchmarks[name] = packet.to_bancho_protocol
+
+    def login_response() -> bytes:
+        writer = packet_writing.PacketWriter()
+        writer.write_many(
+            packet_writing.login_response(
+                user_id=1000,
+                username="player",
+                accuarcy=98.76,
+                play_count=4321,
+                total_score=987_654_321,
+                rank=12345,
+                pp=4567,
+                utc_offset=2,
+            )
+        )
+        return writer.getvalue()
+
+    benchmarks["login_response"] = login_response
+
+    packet = ServerPacket(packet_id=packet_writing.ServerPacketIDS.NOTIFICATION)
+    buffer = bytearray()
+
+    for length in STRING_LENGTHS:
+        string = "a" * length
+
+        benchmarks[f"write_uleb128[{length}]"] = lambda length=length: (
+            packet.write_uleb128(length)
+        )
+        benchmarks[f"write_uleb128_into[{length}]"] = lambda length=length: (
+            packet_writing.write_uleb128_into(buffer, length),
+            buffer.clear(),
+        )
+        benchmarks[f"write_string_into[{length}]"] = lambda string=string: (
+            packet_writing.write_string_into(buffer, string),
+            buffer.clear(),
+        )
+
+    raw_login_data = login_body()
+    benchmarks["login_data"] = lambda: packet_reading.login_data(raw_login_data)
+
+    body = poll_body()
+    benchmarks["iter_packets"] = lambda: list(packet_reading.iter_packets(body))
+    benchmarks["decode_poll"] = lambda: decode_poll(body)
+
+    return benchmarks
+
+
+def run(benchmark: Callable[[], object]) -> float:
+    """Nanoseconds per call, best of REPEAT runs"""
+
+    timer = timeit.Timer(benchmark)
+
+    # autorange runs for at least 0.2 seconds, scale its count to RUN_TIME
+    number, time_taken = timer.autorange()
+    number = max(1, int(number * RUN_TIME / time_taken))
+
+    best = min(timer.repeat(repeat=REPEAT, number=number))
+
+    return best / number * 1e9
+
+
+def run_all(only: str | None = None) -> dict[str, float]:
+    results = {}
+
+    for name, benchmark in collect_benchmarks().items():
+        if only is not None and only not in name:
+            continue
+
+        results[name] = run(benchmark)
+        print(f"{name:<48} {results[name]:>12.1f} ns")
+
+    return results
+
+
+def compare(
+    baseline: dict[str, float], results: dict[str, float], threshold: float
+) -> list[str]:
+    """Print the change of every benchmark, returns the ones that slowed down"""
+
+    slower = []
+
+    print(f"\n{'':<48} {'baseline':>12} {'now':>12} {'change':>8}")
+
+    for name, ns in results.items():
+        if name not in baseline:
+            print(f"{name:<48} {'-':>12} {ns:>12.1f}")
+            continue
+
+        change = ns / baseline[name] - 1
+
+        flag = ""
+        if change > threshold:
+            slower.append(name)
+            flag = "  SLOWER"
+
+        print(f"{name:<48} {baseline[name]:>12.1f} {ns:>12.1f} {change:>+8.1%}{flag}")
+
+    return slower
+
+
+def load(path: str) -> dict[str, float]:
+    return json.loads(Path(path).read_text())["results"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--output", help="save the results as json here")
+    parser.add_argument("--compare", help="baseline results to compare against")
+    parser.add_argument(
+        "--against", help="saved results to compare instead of running again"
+    )
+    parser.add_argument(
+        "--threshold",
+        type=float,
+        default=0.1,
+        help="slowdown that fails a comparison, 0.1 is 10%%",
+    )
+    parser.add_argument("--only", help="only run benchmarks with this in their name")
+
+    args = parser.parse_args()
+
+    if args.against is not None:
+        results = load(args.against)
+    else:
+        results = run_all(args.only)
+
+    if args.output:
+        Path(args.output).write_text(
+            json.dumps(
+                {
+                    "python": platform.python_version(),
+                    "machine": platform.machine(),
+                    "results": results,
+                },
+                indent=2,
+            )
+        )
+
+    if args.compare is None:
+        return
+
+    slower = compare(load(args.compare), results, args.threshold)
+
+    if slower:
+        print(f"\n{len(slower)} benchmarks are slower than the baseline")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,493 @@
+"""Load test: many simulated osu! clients against the server, backed by a fake api.
+
+    python -m tools.loadtest --clients 200 --polls 50 --api-latency 0.01
+
+Starts a stand-in for the backend on localhost:5000 and the server from
+main.py on --port, each in its own process, then logs every client in with
+a real login body and runs its poll loop. Reports requests per second and
+p50/p99 latency for logins and polls.
+
+--target uses an already running server and starts nothing, e.g. one started
+with `--serve app` next to a fake api started with `--serve fake-api`.
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+import uuid
+from pathlib import Path
+from typing import Any
+from urllib.parse import urlsplit
+
+import uvicorn
+from fastapi import FastAPI, Request, Response
+
+from packets.reading import PACKET_HEADER
+from packets.writing import ClientPacketIDS, ServerPacketIDS
+
+ROOT = Path(__file__).resolve().parent.parent
+
+# adapters/api.py and repositories/config.py expect the backend here
+FAKE_API_PORT = 5000
+
+PING_PACKET = PACKET_HEADER.pack(ClientPacketIDS.PING, 0)
+LOGOUT_PACKET = PACKET_HEADER.pack(ClientPacketIDS.LOGOUT, 0)
+RESTART_PACKET_ID = ServerPacketIDS.RESTART.to_bytes(2, "little")
+
+# seconds to wait for a started process to accept connections
+STARTUP_TIMEOUT = 15.0
+
+
+def create_fake_api(latency: float, jitter: float) -> FastAPI:
+    """The endpoints of the backend used by the server, with an artificial delay"""
+
+    fake_api = FastAPI()
+
+    user_ids: dict[str, int] = {}
+    usernames: dict[int, str] = {}
+
+    config = {
+        "osu_folder_path": "C:/osu!",
+        "display_pp_on_leaderboard": True,
+        "rank_scores_by_pp_or_score": True,
+        "num_scores_seen_on_leaderboards": 50,
+        "allow_pp_from_modified_maps": False,
+        "osu_api_key": None,
+        "osu_daily_api_key": "",
+        "osu_api_v2_client_id": 0,
+        "osu_api_v2_client_secret": "",
+        "osu_username": None,
+        "osu_password": None,
+        "dedicated_dev_server_domain": "localhost",
+    }
+    config_etag = '"loadtest"'
+
+    @fake_api.middleware("http")
+    async def add_latency(request: Request, call_next):
+        if latency or jitter:
+            await asyncio.sleep(latency + random.uniform(0, jitter))
+
+        return await call_next(request)
+
+    def get_user_id(username: str) -> int:
+        if username not in user_ids:
+            user_ids[username] = len(user_ids) + 1
+            usernames[user_ids[username]] = username
+
+        return user_ids[username]
+
+    def get_pp(user_id: int) -> int:
+        return (user_id * 7919) % 12000
+
+    def get_rank_from_pp(pp: float) -> int:
+        return max(1, 1_000_000 - int(pp * 80))
+
+    @fake_api.post("/api/v1/bancho/login")
+    async def login(body: dict[str, Any]):
+        user_id = get_user_id(body["username"])
+
+        return {
+            "message": "Logged in",
+            "profile": {"user_id": user_id, "username": body["username"]},
+            "session": {
+                "current_osu_token": str(uuid.uuid4()),
+                "current_user_id": user_id,
+                "current_packet_queue": [],
+            },
+        }
+
+    # the server sends the unused one of user_id and username empty
+    @fake_api.get("/api/v1/profile/")
+    async def profile(user_id: str = "", username: str = ""):
+        if user_id:
+            user_id = int(user_id)
+        elif username:
+            user_id = get_user_id(username)
+        else:
+            return Response(status_code=400)
+
+        if user_id not in usernames:
+            return Response(status_code=404)
+
+        return {
+            "user_id": user_id,
+            "username": usernames[user_id],
+            "accuracy": 98.5,
+            "play_count": user_id * 3,
+            "total_score": user_id * 1_000_000,
+            "pp": get_pp(user_id),
+        }
+
+    @fake_api.get("/api/v1/utils/get_rank_from_pp")
+    async def rank_from_pp(pp: float):
+        return {"rank": get_rank_from_pp(pp), "pp": pp}
+
+    @fake_api.get("/api/v1/utils/rank_thresholds")
+    async def rank_thresholds():
+        return [
+            {"rank": get_rank_from_pp(pp), "pp": pp} for pp in range(12000, -1, -10)
+        ]
+
+    @fake_api.post("/api/v1/bancho/logout")
+    async def logout(body: dict[str, Any]):
+        return {"message": "Logged out"}
+
+    @fake_api.get("/api/v1/config/")
+    async def get_config(request: Request):
+        if request.headers.get("if-none-match") == config_etag:
+            return Response(status_code=304)
+
+        return Response(
+            content=json.dumps(config),
+            media_type="application/json",
+            headers={"ETag": config_etag},
+        )
+
+    return fake_api
+
+
+def login_body(username: str) -> bytes:
+    """A login request body, as sent by the osu! client"""
+
+    password_md5 = hashlib.md5(b"password").hexdigest()
+    client_hash = hashlib.md5(username.encode()).hexdigest()
+
+    # osu path md5, adapters, adapters md5, uninstall md5, disk signature md5
+    client_hashes = (
+        f"{client_hash}:runningunderwine.:{client_hash}:{client_hash}:{client_hash}:"
+    )
+
+    return f"{username}\n{password_md5}\nb20240123|0|1|{client_hashes}|0\n".encode()
+
+
+class Results:
+    def __init__(self) -> None:
+        self.latencies: dict[str, list[float]] = {"login": [], "poll": []}
+        self.errors: dict[str, int] = {"login": 0, "poll": 0}
+        self.durations: dict[str, float] = {}
+
+    def record(self, kind: str, latency: float, ok: bool) -> None:
+        self.latencies[kind].append(latency)
+
+        if not ok:
+            self.errors[kind] += 1
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        summary = {}
+
+        for kind, latencies in self.latencies.items():
+            latencies = sorted(latencies)
+            duration = self.durations.get(kind, 0.0)
+
+            summary[kind] = {
+                "requests": len(latencies),
+                "errors": self.errors[kind],
+                "rps": len(latencies) / duration if duration else 0.0,
+                "p50_ms": percentile(latencies, 0.50) * 1000,
+                "p99_ms": percentile(latencies, 0.99) * 1000,
+                "max_ms": (latencies[-1] if latencies else 0.0) * 1000,
+            }
+
+        return summary
+
+
+def percentile(sorted_values: list[float], fraction: float) -> float:
+    if not sorted_values:
+        return 0.0
+
+    # nearest rank
+    index = max(0, math.ceil(fraction * len(sorted_values)) - 1)
+    return sorted_values[index]
+
+
+class BanchoConnection:
+    """A single keep-alive HTTP/1.1 connection that only speaks bancho polls.
+
+    Far lighter than a general purpose client, so the load test measures
+    the server rather than itself.
+    """
+
+    def __init__(self, url: str) -> None:
+        parts = urlsplit(url)
+
+        self.host = parts.hostname or "127.0.0.1"
+        self.port = parts.port or 80
+        self.path = parts.path or "/"
+
+        self.reader: asyncio.StreamReader | None = None
+        self.writer: asyncio.StreamWriter | None = None
+
+    async def post(
+        self, body: bytes, osu_token: str | None
+    ) -> tuple[int, dict[str, str], bytes]:
+        if self.writer is None:
+            self.reader, self.writer = await asyncio.open_connection(
+                self.host, self.port
+            )
+
+        assert self.reader is not None
+
+        head = (
+            f"POST {self.path} HTTP/1.1\r\n"
+            f"host: {self.host}:{self.port}\r\n"
+            "user-agent: osu!\r\n"
+            f"content-length: {len(body)}\r\n"
+        )
+        if osu_token is not None:
+            head += f"osu-token: {osu_token}\r\n"
+
+        self.writer.write(head.encode() + b"\r\n" + body)
+
+        try:
+            raw_head = await self.reader.readuntil(b"\r\n\r\n")
+        except (asyncio.IncompleteReadError, ConnectionError):
+            await self.close()
+            raise
+
+        status_line, *header_lines = raw_head.decode("latin-1").split("\r\n")
+
+        headers = {}
+        for line in header_lines:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.lower()] = value.strip()
+
+        content = await self.reader.readexactly(int(headers.get("content-length", 0)))
+
+        return int(status_line.split(" ", 2)[1]), headers, content
+
+    async def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+
+class SimulatedClient:
+    def __init__(self, url: str, username: str) -> None:
+        self.connection = BanchoConnection(url)
+        self.username = username
+        self.osu_token: str | None = None
+
+    async def login(self, results: Results) -> None:
+        started_at = time.perf_counter()
+
+        try:
+            status, headers, _ = await self.connection.post(
+                login_body(self.username), osu_token=None
+            )
+        except (OSError, asyncio.IncompleteReadError):
+            results.record("login", time.perf_counter() - started_at, ok=False)
+            return
+
+        osu_token = headers.get("cho-token")
+        ok = status == 200 and osu_token not in (None, "ERROR")
+
+        results.record("login", time.perf_counter() - started_at, ok=ok)
+
+        if ok:
+            self.osu_token = osu_token
+
+    async def poll(self, results: Results, polls: int, interval: float) -> None:
+        if self.osu_token is None:
+            return
+
+        for _ in range(polls):
+            started_at = time.perf_counter()
+
+            try:
+                status, _, content = await self.connection.post(
+                    PING_PACKET, self.osu_token
+                )
+                # a restart packet means the server lost the session
+                ok = status == 200 and not content.startswith(RESTART_PACKET_ID)
+            except (OSError, asyncio.IncompleteReadError):
+                ok = False
+
+            results.record("poll", time.perf_counter() - started_at, ok=ok)
+
+            if interval:
+                await asyncio.sleep(interval)
+
+    async def logout(self) -> None:
+        if self.osu_token is not None:
+            try:
+                await self.connection.post(LOGOUT_PACKET, self.osu_token)
+            except (OSError, asyncio.IncompleteReadError):
+                pass
+
+        await self.connection.close()
+
+
+async def run_clients(
+    url: str, clients: int, polls: int, poll_interval: float
+) -> Results:
+    results = Results()
+
+    simulated_clients = [
+        SimulatedClient(url, username=f"loadtest{i}") for i in range(clients)
+    ]
+
+    started_at = time.perf_counter()
+    await asyncio.gather(*(client.login(results) for client in simulated_clients))
+    results.durations["login"] = time.perf_counter() - started_at
+
+    started_at = time.perf_counter()
+    await asyncio.gather(
+        *(client.poll(results, polls, poll_interval) for client in simulated_clients)
+    )
+    results.durations["poll"] = time.perf_counter() - started_at
+
+    await asyncio.gather(*(client.logout() for client in simulated_clients))
+
+    return results
+
+
+def wait_for_port(port: int, process: subprocess.Popen) -> None:
+    deadline = time.monotonic() + STARTUP_TIMEOUT
+
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(
+                f"process for port {port} exited with {process.returncode}"
+            )
+
+        try:
+            with socket.create_connection(("127.0.0.1", port), timeout=0.2):
+                return
+        except OSError:
+            time.sleep(0.1)
+
+    raise RuntimeError(f"nothing is listening on port {port}")
+
+
+def start_process(args: list[str], port: int, cwd: str) -> subprocess.Popen:
+    env = {**os.environ, "PYTHONPATH": str(ROOT)}
+
+    process = subprocess.Popen(
+        [sys.executable, "-m", "tools.loadtest", *args], cwd=cwd, env=env
+    )
+
+    try:
+        wait_for_port(port, process)
+    except BaseException:
+        process.terminate()
+        raise
+
+    return process
+
+
+def serve_fake_api(latency: float, jitter: float) -> None:
+    uvicorn.run(
+        create_fake_api(latency, jitter),
+        port=FAKE_API_PORT,
+        log_level="warning",
+        access_log=False,
+    )
+
+
+def serve_app(port: int) -> None:
+    import main
+
+    main.WATCH_CLIENT_EXIT = False
+
+    uvicorn.run(main.server, port=port, log_level="warning", access_log=False)
+
+
+def print_summary(summary: dict[str, dict[str, float]]) -> None:
+    print(
+        f"{'':<6} {'requests':>9} {'errors':>7} {'rps':>10} "
+        f"{'p50 ms':>8} {'p99 ms':>8} {'max ms':>8}"
+    )
+
+    for kind, row in summary.items():
+        print(
+            f"{kind:<6} {row['requests']:>9} {row['errors']:>7} {row['rps']:>10.1f} "
+            f"{row['p50_ms']:>8.2f} {row['p99_ms']:>8.2f} {row['max_ms']:>8.2f}"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--clients", type=int, default=100)
+    parser.add_argument("--polls", type=int, default=20, help="polls per client")
+    parser.add_argument(
+        "--poll-interval", type=float, default=0.0, help="seconds between polls"
+    )
+    parser.add_argument(
+        "--api-latency", type=float, default=0.005, help="seconds per fake api call"
+    )
+    parser.add_argument(
+        "--api-jitter", type=float, default=0.0, help="extra random seconds, up to"
+    )
+    parser.add_argument("--port", type=int, default=5001)
+    parser.add_argument("--target", help="url of an already running server")
+    parser.add_argument("--output", help="also write the results as json here")
+
+    parser.add_argument(
+        "--serve",
+        choices=("fake-api", "app"),
+        help="only run the fake api or the server, the load test uses this itself",
+    )
+
+    args = parser.parse_args()
+
+    if args.serve == "fake-api":
+        return serve_fake_api(args.api_latency, args.api_jitter)
+
+    if args.serve == "app":
+        return serve_app(args.port)
+
+    processes: list[subprocess.Popen] = []
+
+    # the server writes its log file into the working directory
+    with tempfile.TemporaryDirectory() as workdir:
+        try:
+            if args.target is None:
+                processes.append(
+                    start_process(
+                        [
+                            "--serve=fake-api",
+                            f"--api-latency={args.api_latency}",
+                            f"--api-jitter={args.api_jitter}",
+                        ],
+                        FAKE_API_PORT,
+                        workdir,
+                    )
+                )
+                processes.append(
+                    start_process(
+                        ["--serve=app", f"--port={args.port}"], args.port, workdir
+                    )
+                )
+
+            url = args.target or f"http://127.0.0.1:{args.port}/c/"
+
+            results = asyncio.run(
+                run_clients(url, args.clients, args.polls, args.poll_interval)
+            )
+        finally:
+            for process in processes:
+                process.terminate()
+
+            for process in processes:
+                process.wait()
+
+    summary = results.summary()
+
+    print_summary(summary)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1 +1 @@
-from . import application, bancho
+from . import application, bancho, config, profiler, ranks
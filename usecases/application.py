@@ -10,6 +10,14 @@ def is_client_running() -> bool:
     return application_repo.is_client_running()
 
 
+async def wait_for_client_exit() -> None:
+    """Wait until osu! exits, returns at once if it isn't running"""
+
+    application_repo = ApplicationRepo()
+
+    await application_repo.wait_for_client_exit()
+
+
 def get_osu_folder_path() -> dict[str, str] | ServerError:
     """Get osu! folder path"""
 
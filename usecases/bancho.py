@@ -1,11 +1,19 @@
+import asyncio
 from typing import TypedDict
 
 import adapters.api as api
-import crons.client
 import packets.reading as packet_reading
 import packets.writing as packet_writing
-from errors import ServerError
+import usecases.ranks as ranks
+from errors import AdapterAPIError, BanchoError, ServerError
 from packets.writing import ServerPacket
+from repositories.sessions import Session, session_repo
+
+# seconds the whole login may take, backend calls included
+LOGIN_TIMEOUT = 10
+
+# tries to log a failed login out of the backend, one per breaker reset timeout
+UNDO_LOGIN_ATTEMPTS = 5
 
 
 class LoginResponse(TypedDict):
@@ -13,66 +21,151 @@ class LoginResponse(TypedDict):
     packets: list[ServerPacket]
 
 
-async def logout(user_id: int) -> None | ServerError:
-    response = await api.logout(user_id=user_id)
+def get_session(osu_token: str) -> Session | None:
+    return session_repo.get(osu_token)
+
+
+def get_sessions() -> list[Session]:
+    return session_repo.all()
+
+
+async def wait_for_sessions() -> None:
+    """Wait until at least one client is logged in"""
+
+    await session_repo.has_sessions.wait()
+
+
+def get_idle_sessions(max_idle: float) -> list[Session]:
+    return session_repo.idle(max_idle)
+
+
+async def logout(session: Session) -> None | ServerError:
+    session_repo.remove(session)
+
+    if session_repo.has_user(session.user_id):
+        return None
+
+    response = await api.logout(user_id=session.user_id)
     return response
 
 
+def login_error(error: ServerError) -> LoginResponse:
+    # a no-op for errors already logged when they were created
+    error.print_error()
+
+    # the captured variables stay in the log, they are costly to format
+    return LoginResponse(
+        osu_token="ERROR",
+        packets=packet_writing.login_error_response(error_message=error.error_message),
+    )
+
+
 async def login(raw_login_data: bytes) -> LoginResponse:
     login_info = packet_reading.login_data(raw_login_data)
 
+    try:
+        return await asyncio.wait_for(login_pipeline(login_info), LOGIN_TIMEOUT)
+    except asyncio.TimeoutError:
+        # wait_for has cancelled every backend call still in flight
+        return login_error(
+            ServerError(
+                error_name=BanchoError.LOGIN_TIMED_OUT,
+                message=f"Login took longer than {LOGIN_TIMEOUT} seconds",
+                file_location=__file__,
+                line=ServerError.get_current_line(),
+                local_variables=locals(),
+                in_scope_variables=dir(),
+            )
+        )
+
+
+async def login_pipeline(login_info: packet_reading.LoginInfo) -> LoginResponse:
+    # the profile only needs the username, so it is fetched alongside the login
     # TODO: utilize logging more
-    login_response = await api.login(username=login_info["username"])
+    login_task = asyncio.create_task(api.login(username=login_info["username"]))
+    # a miss isn't reported, the profile may not exist until the login created it
+    profile_task = asyncio.create_task(
+        api.get_profile(username=login_info["username"], missing_ok=True)
+    )
 
-    if isinstance(login_response, ServerError):
-        login_response.print_error()
-        return LoginResponse(
-            osu_token="ERROR",
-            packets=packet_writing.login_error_response(
-                error_message=login_response.detailed_error_message
-            ),
-        )
+    try:
+        # let both requests go out, then build the packets while they are in flight
+        await asyncio.sleep(0)
+        packet_writing.get_constant_login_packets()
 
-    # only set the user id if we are logged in
-    # TODO: maybe interrupt the whole idea of a session?
-    crons.client.USER_ID = login_response["profile"]["user_id"]
+        login_response = await login_task
+    except BaseException:
+        profile_task.cancel()
+        raise
+
+    if isinstance(login_response, ServerError):
+        profile_task.cancel()
+        return login_error(login_response)
 
     # we are now logged in server side
     # but we need some more data from the api
     # so we can send the proper login response
+    # any failure from here on, timeouts included, undoes the login
+
+    try:
+        reponse_via_bancho_protocol = await build_login_packets(
+            login_info, login_response, profile_task
+        )
+    except BaseException:
+        profile_task.cancel()
+        undo_login(login_response["profile"]["user_id"])
+        raise
 
-    user_stats_response = await api.get_profile(
-        user_id=login_response["profile"]["user_id"]
+    if isinstance(reponse_via_bancho_protocol, ServerError):
+        undo_login(login_response["profile"]["user_id"])
+        return login_error(reponse_via_bancho_protocol)
+
+    # only create the session once the client has everything it needs
+    session_repo.create(
+        osu_token=login_response["session"]["current_osu_token"],
+        user_id=login_response["profile"]["user_id"],
+        username=login_response["profile"]["username"],
+    )
+
+    return LoginResponse(
+        osu_token=login_response["session"]["current_osu_token"],
+        packets=reponse_via_bancho_protocol,
     )
 
-    if isinstance(user_stats_response, ServerError):
-        user_stats_response.print_error()
-        return LoginResponse(
-            osu_token="ERROR",
-            packets=packet_writing.login_error_response(
-                error_message=user_stats_response.detailed_error_message
-            ),
-        )
 
-    rank_response = await api.get_rank(pp=user_stats_response["pp"])
+async def build_login_packets(
+    login_info: packet_reading.LoginInfo,
+    login_response: api.LoginResponse,
+    profile_task: asyncio.Task[api.ProfileResponse | None | ServerError],
+) -> list[ServerPacket] | ServerError:
+    user_stats_response = await profile_task
 
-    if isinstance(rank_response, ServerError):
-        rank_response.print_error()
-        return LoginResponse(
-            osu_token="ERROR",
-            packets=packet_writing.login_error_response(
-                error_message=rank_response.detailed_error_message
-            ),
+    if user_stats_response is None or isinstance(user_stats_response, ServerError):
+        # the profile may not exist until the login created it, retry by id
+        user_stats_response = await api.get_profile(
+            user_id=login_response["profile"]["user_id"]
         )
 
+    # only lookups by username may miss
+    assert user_stats_response is not None
+
+    if isinstance(user_stats_response, ServerError):
+        return user_stats_response
+
+    # resolved from the local rank index when possible
+    rank = await ranks.get_rank(pp=user_stats_response["pp"])
+
+    if isinstance(rank, ServerError):
+        return rank
+
     # write the login response packet with all the collected data
-    reponse_via_bancho_protocol = packet_writing.login_response(
+    return packet_writing.login_response(
         user_id=login_response["profile"]["user_id"],
         username=login_response["profile"]["username"],
         accuarcy=user_stats_response["accuracy"],
         play_count=user_stats_response["play_count"],
         total_score=user_stats_response["total_score"],
-        rank=rank_response["rank"],
+        rank=rank,
         pp=user_stats_response["pp"],
         utc_offset=login_info["utc_offset"],
         country_code=None,  # TODO: get country code
@@ -80,7 +173,43 @@ async def login(raw_login_data: bytes) -> LoginResponse:
         latitude=0.0,  # TODO: get latitude (I don't think we need this)
     )
 
-    return LoginResponse(
-        osu_token=login_response["session"]["current_osu_token"],
-        packets=reponse_via_bancho_protocol,
-    )
+
+# logouts sent in the background, referenced until they finish
+pending_logouts: set[asyncio.Task] = set()
+
+
+def undo_login(user_id: int) -> None:
+    """Log a user out of the backend after a login that couldn't be completed.
+
+    Sent in the background, so it also works from a cancelled login.
+    """
+
+    if session_repo.has_user(user_id):
+        return
+
+    task = asyncio.create_task(retry_undo_login(user_id))
+
+    pending_logouts.add(task)
+    task.add_done_callback(pending_logouts.discard)
+
+
+async def retry_undo_login(user_id: int) -> None:
+    """The failed login may have opened the circuit breaker,
+    so a refused logout is tried again once the breaker lets calls through.
+    """
+
+    for attempt in range(UNDO_LOGIN_ATTEMPTS):
+        if attempt > 0:
+            await asyncio.sleep(api.backend_breaker.reset_timeout)
+
+            # logged in again meanwhile
+            if session_repo.has_user(user_id):
+                return
+
+        response = await api.logout(user_id=user_id)
+
+        if not (
+            isinstance(response, ServerError)
+            and response.error_name is AdapterAPIError.BACKEND_UNAVAILABLE
+        ):
+            return
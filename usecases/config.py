@@ -0,0 +1,22 @@
+from typing import Callable
+
+from errors import ServerError
+from repositories.config import ConfigJSON, config_provider
+
+
+def get_cached_config() -> ConfigJSON | None:
+    """The config as last fetched, without any request, for hot paths"""
+
+    return config_provider.config
+
+
+async def get_config() -> ConfigJSON | ServerError:
+    return await config_provider.get()
+
+
+async def refresh_config() -> ConfigJSON | ServerError:
+    return await config_provider.refresh()
+
+
+def on_config_change(callback: Callable[[ConfigJSON], None]) -> None:
+    config_provider.subscribe(callback)
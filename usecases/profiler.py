@@ -0,0 +1,56 @@
+from typing import Literal
+
+from common.profiler import collapse_stacks, dump_pstats, request_profiler
+from errors import ProfilerError, ServerError
+
+# profiled requests when neither a request count nor a time window is given
+DEFAULT_PROFILED_REQUESTS = 100
+
+ProfileFormat = Literal["pstats", "collapsed"]
+
+
+def start_profiling(
+    requests: int | None = None,
+    seconds: float | None = None,
+    route: str | None = None,
+) -> dict[str, object]:
+    """Profile the next requests, discarding the previous profile"""
+
+    if requests is None and seconds is None:
+        requests = DEFAULT_PROFILED_REQUESTS
+
+    request_profiler.start(requests=requests, seconds=seconds, route=route)
+
+    return request_profiler.status()
+
+
+def stop_profiling() -> dict[str, object]:
+    request_profiler.stop()
+
+    return request_profiler.status()
+
+
+def get_profiler_status() -> dict[str, object]:
+    return request_profiler.status()
+
+
+def get_profile(format: ProfileFormat) -> bytes | ServerError:
+    """The profile collected so far, as pstats or collapsed stacks"""
+
+    stats = request_profiler.get_stats()
+
+    if stats is None:
+        return ServerError(
+            error_name=ProfilerError.NO_PROFILE,
+            message="No request has been profiled yet.",
+            file_location=__file__,
+            line=ServerError.get_current_line(),
+            status_code=404,
+            local_variables=locals(),
+            in_scope_variables=dir(),
+        )
+
+    if format == "pstats":
+        return dump_pstats(stats)
+
+    return collapse_stacks(stats).encode()
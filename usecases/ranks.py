@@ -0,0 +1,42 @@
+import adapters.api as api
+from common.log import LogTypes, log
+from errors import ServerError
+from repositories.ranks import rank_index
+
+
+async def load_rank_index() -> bool:
+    """Load every rank threshold from the api into the local index,
+    returns whether it was loaded
+    """
+
+    response = await api.get_rank_thresholds()
+
+    if isinstance(response, ServerError):
+        return False
+
+    rank_index.load([(threshold["pp"], threshold["rank"]) for threshold in response])
+
+    log(f"Rank index loaded with {len(rank_index)} thresholds", LogTypes.SUCCESS)
+
+    return True
+
+
+def update_rank(pp: float, rank: int) -> None:
+    """Record a rank the api resolved, e.g. after a score submission"""
+
+    rank_index.add(pp, rank)
+
+
+async def get_rank(pp: int) -> int | ServerError:
+    rank = rank_index.lookup(pp)
+    if rank is not None:
+        return rank
+
+    response = await api.get_rank(pp=pp)
+
+    if isinstance(response, ServerError):
+        return response
+
+    rank_index.add(pp, response["rank"])
+
+    return response["rank"]